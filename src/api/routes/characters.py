@@ -4,14 +4,15 @@ from pydantic import BaseModel
 from typing import List, Optional
 import logging
 
-from src.services.character_service import CharacterService
+from src.services.character_service import CharacterService, get_character_service
 from src.services.character_cache import CharacterCache
+from src.utils.chunk_reader import read_document_text
 from src.config import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-character_service = CharacterService()
+character_service = get_character_service()
 character_cache = CharacterCache()
 
 class ExtractCharactersRequest(BaseModel):
@@ -48,13 +49,8 @@ async def extract_characters(request: ExtractCharactersRequest):
             detail=f"Document {request.document_id} not found. Please upload a document first."
         )
     
-    # Read and reconstruct text from chunks
-    with open(chunks_path, 'r', encoding='utf-8') as f:
-        chunks_content = f.read()
-    
-    # Extract text from chunks (remove chunk headers)
-    import re
-    full_text = re.sub(r'=== CHUNK \d+ ===\n', '', chunks_content)
+    # Reconstruct only as much text from chunks as the LLM prompts use
+    full_text = read_document_text(chunks_path, max_chars=CharacterService.EXTRACTION_SAMPLE_CHARS)
     
     if not full_text or len(full_text) < 100:
         raise HTTPException(
@@ -63,25 +59,18 @@ async def extract_characters(request: ExtractCharactersRequest):
         )
     
     try:
-        # Extract characters using LLM
-        characters = character_service.extract_characters(
-            text=full_text,
-            max_characters=request.max_characters
-        )
-        
-        # Generate personality summaries if requested
+        # Extract characters using LLM, with personality summaries from the
+        # same call if requested
         if request.include_personality:
-            for character in characters:
-                try:
-                    personality = character_service.generate_personality_summary(
-                        character_name=character['name'],
-                        text=full_text
-                    )
-                    character['personality'] = personality
-                except Exception as e:
-                    # If personality generation fails, continue without it
-                    character['personality'] = None
-                    logger.warning(f"Failed to generate personality for {character['name']}: {e}")
+            characters = await character_service.aextract_characters_with_personalities(
+                text=full_text,
+                max_characters=request.max_characters
+            )
+        else:
+            characters = await character_service.aextract_characters(
+                text=full_text,
+                max_characters=request.max_characters
+            )
         
         # Save to cache
         character_cache.save_characters(request.document_id, characters)
@@ -128,20 +117,15 @@ async def extract_characters_get(document_id: str, include_personality: bool = T
             detail=f"Document {document_id} not found. Please upload a document first."
         )
     
-    # Read and reconstruct text from chunks
+    # Reconstruct only as much text from chunks as the LLM prompts use
     try:
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            chunks_content = f.read()
+        full_text = read_document_text(chunks_path, max_chars=CharacterService.EXTRACTION_SAMPLE_CHARS)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error reading document file: {str(e)}"
         )
     
-    # Extract text from chunks (remove chunk headers)
-    import re
-    full_text = re.sub(r'=== CHUNK \d+ ===\n', '', chunks_content)
-    
     if not full_text or len(full_text) < 100:
         raise HTTPException(
             status_code=400,
@@ -149,25 +133,18 @@ async def extract_characters_get(document_id: str, include_personality: bool = T
         )
     
     try:
-        # Extract characters using LLM
-        characters = character_service.extract_characters(
-            text=full_text,
-            max_characters=10
-        )
-        
-        # Generate personality summaries if requested
+        # Extract characters using LLM, with personality summaries from the
+        # same call if requested
         if include_personality:
-            for character in characters:
-                try:
-                    personality = character_service.generate_personality_summary(
-                        character_name=character['name'],
-                        text=full_text
-                    )
-                    character['personality'] = personality
-                except Exception as e:
-                    # If personality generation fails, continue without it
-                    character['personality'] = None
-                    logger.warning(f"Failed to generate personality for {character['name']}: {e}")
+            characters = await character_service.aextract_characters_with_personalities(
+                text=full_text,
+                max_characters=10
+            )
+        else:
+            characters = await character_service.aextract_characters(
+                text=full_text,
+                max_characters=10
+            )
         
         # Save to cache for future use
         character_cache.save_characters(document_id, characters)
@@ -9,13 +9,14 @@ from pathlib import Path
 import json
 
 from src.services.chat_service import ChatService
-from src.services.character_service import CharacterService
+from src.services.character_service import CharacterService, get_character_service
 from src.services.character_cache import CharacterCache
+from src.utils.chunk_reader import read_document_text
 from src.config import settings
 
 router = APIRouter()
 chat_service = ChatService()
-character_service = CharacterService()
+character_service = get_character_service()
 character_cache = CharacterCache()
 
 class ChatMessage(BaseModel):
@@ -60,16 +61,11 @@ async def chat_with_character(request: ChatRequest):
     
     if not character:
         # Cache miss - need to extract characters (SLOW PATH)
-        # Read document chunks
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            chunks_content = f.read()
-        
-        # Reconstruct text
-        import re
-        full_text = re.sub(r'=== CHUNK \d+ ===\n', '', chunks_content)
+        # Reconstruct only as much text from chunks as extraction uses
+        full_text = read_document_text(chunks_path, max_chars=CharacterService.EXTRACTION_SAMPLE_CHARS)
         
         # Extract characters (use higher limit to find more characters)
-        characters = character_service.extract_characters(
+        characters = await character_service.aextract_characters(
             text=full_text,
             max_characters=30
         )
@@ -157,16 +153,11 @@ async def get_character_greeting(request: GreetingRequest):
     
     if not character:
         # Cache miss - need to extract characters (SLOW PATH)
-        # Read document chunks
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            chunks_content = f.read()
-        
-        # Reconstruct text
-        import re
-        full_text = re.sub(r'=== CHUNK \d+ ===\n', '', chunks_content)
+        # Reconstruct only as much text from chunks as extraction uses
+        full_text = read_document_text(chunks_path, max_chars=CharacterService.EXTRACTION_SAMPLE_CHARS)
         
         # Extract characters (use higher limit to find more characters)
-        characters = character_service.extract_characters(
+        characters = await character_service.aextract_characters(
             text=full_text,
             max_characters=30
         )
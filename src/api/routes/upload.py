@@ -1,15 +1,126 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
 from pathlib import Path
+from typing import Dict
+import logging
+import queue
+import threading
 import uuid
 import os
 
 from src.utils.text_extractor import TextExtractor
-from src.rag.rag_service import RAGService
+from src.rag.registry import rag
 from src.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 text_extractor = TextExtractor()
-rag_service = RAGService()
+rag_service = rag()
+
+# Number of chunks handed to the indexing stage at a time; large enough
+# to keep every parallel embedding worker busy
+INDEX_BATCH_SIZE = 256
+
+def _process_document(document_id: str, pdf_path: Path, chunks_path: Path, filename: str) -> Dict:
+    """
+    Extract, chunk and index a PDF as overlapping pipeline stages
+    
+    A reader thread streams pages out of the PDF, this thread chunks them and
+    writes the chunks file, and an indexer thread embeds finished batches, so
+    PDF parsing and chunking run while earlier batches are being embedded.
+    
+    Returns:
+        Dictionary with page_count, text_length, chunks_count and rag_indexed
+    """
+    pages_queue = queue.Queue()
+    batches_queue = queue.Queue()
+    info = {}
+    errors = {}
+    stats = {"text_length": 0, "chunks_count": 0}
+    
+    def read_pages():
+        try:
+            for page in text_extractor.iter_pages(str(pdf_path), info):
+                pages_queue.put(page["text"])
+        except Exception as e:
+            errors["extract"] = e
+        finally:
+            pages_queue.put(None)
+    
+    def index_batches():
+        while True:
+            item = batches_queue.get()
+            if item is None:
+                return
+            # Keep draining after a failure so the producer never blocks
+            if "rag" in errors:
+                continue
+            start_index, batch = item
+            try:
+                rag_service.add_chunk_batch(
+                    document_id=document_id,
+                    chunks=batch,
+                    start_index=start_index,
+                    metadata={
+                        "filename": filename,
+                        "page_count": info.get("page_count", 0)
+                    }
+                )
+            except Exception as rag_error:
+                errors["rag"] = rag_error
+    
+    def page_texts():
+        # Re-create the "\n\n" page separators of the full text
+        while True:
+            text = pages_queue.get()
+            if text is None:
+                return
+            if stats["text_length"]:
+                text = "\n\n" + text
+            stats["text_length"] += len(text)
+            yield text
+    
+    reader = threading.Thread(target=read_pages, daemon=True)
+    indexer = threading.Thread(target=index_batches, daemon=True)
+    reader.start()
+    indexer.start()
+    
+    try:
+        with open(chunks_path, 'w', encoding='utf-8') as f:
+            batch = []
+            for i, chunk in enumerate(text_extractor.iter_chunks(page_texts(), chunk_size=1000, overlap=100)):
+                f.write(f"=== CHUNK {i+1} ===\n{chunk}\n\n")
+                batch.append(chunk)
+                stats["chunks_count"] += 1
+                if len(batch) >= INDEX_BATCH_SIZE:
+                    batches_queue.put((stats["chunks_count"] - len(batch), batch))
+                    batch = []
+            if batch:
+                batches_queue.put((stats["chunks_count"] - len(batch), batch))
+    finally:
+        batches_queue.put(None)
+        reader.join()
+        indexer.join()
+    
+    if "extract" in errors:
+        raise errors["extract"]
+    
+    if stats["text_length"] < 100:
+        raise Exception("PDF appears to be empty or contains no extractable text")
+    
+    rag_indexed = "rag" not in errors
+    if not rag_indexed:
+        # Log error but don't fail the upload
+        logger.warning(f"RAG indexing failed (non-critical): {errors['rag']}")
+        rag_service.delete_document(document_id)
+    
+    logger.info(f"Successfully extracted {info['page_count']} pages using {info['method']}")
+    return {
+        "page_count": info["page_count"],
+        "text_length": stats["text_length"],
+        "chunks_count": stats["chunks_count"],
+        "rag_indexed": rag_indexed
+    }
 
 @router.post("/upload")
 async def upload_storybook(file: UploadFile = File(...)):
@@ -37,46 +148,17 @@ async def upload_storybook(file: UploadFile = File(...)):
         with open(pdf_path, 'wb') as f:
             f.write(content)
         
-        # Extract text from PDF
-        result = text_extractor.extract_from_pdf(str(pdf_path))
-        
-        # Create text chunks
-        chunks = text_extractor.chunk_text(
-            result['full_text'],
-            chunk_size=1000,
-            overlap=100
-        )
-        
-        # Save chunks to file
-        with open(chunks_path, 'w', encoding='utf-8') as f:
-            for i, chunk in enumerate(chunks):
-                f.write(f"=== CHUNK {i+1} ===\n{chunk}\n\n")
-        
-        # Try to add chunks to vector store for RAG (optional - don't fail if RAG fails)
-        rag_indexed = False
-        try:
-            rag_service.add_document_chunks(
-                document_id=document_id,
-                chunks=chunks,
-                metadata={
-                    "filename": file.filename,
-                    "page_count": result['page_count']
-                }
-            )
-            rag_indexed = True
-        except Exception as rag_error:
-            # Log error but don't fail the upload
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"RAG indexing failed (non-critical): {rag_error}")
+        # Extract, chunk, save and index the text (RAG indexing is optional)
+        result = _process_document(document_id, pdf_path, chunks_path, file.filename)
+        rag_indexed = result['rag_indexed']
         
         return {
             "status": "success",
             "document_id": document_id,
             "filename": file.filename,
             "page_count": result['page_count'],
-            "text_length": result['total_length'],
-            "chunks_count": len(chunks),
+            "text_length": result['text_length'],
+            "chunks_count": result['chunks_count'],
             "rag_indexed": rag_indexed,
             "message": "Storybook processed" + (" and indexed for RAG" if rag_indexed else " (RAG indexing skipped)")
         }
@@ -87,4 +169,5 @@ async def upload_storybook(file: UploadFile = File(...)):
             os.remove(pdf_path)
         if chunks_path.exists():
             os.remove(chunks_path)
+        rag_service.delete_document(document_id)
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
\ No newline at end of file
@@ -23,6 +23,7 @@ class Settings(BaseSettings):
     # Gemini Configuration 
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = "models/gemini-2.5-flash"
+    GEMINI_REQUEST_TIMEOUT: float = 60.0  # seconds per API call
     
     # Which AI provider to use: "openai" or "gemini"
     AI_PROVIDER: str = os.getenv("AI_PROVIDER", "gemini")
@@ -35,6 +36,10 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "./data/uploads"
     MAX_FILE_SIZE: int = 52428800  # 50 MB
 
+    # LLM result cache
+    LLM_CACHE_DIR: str = "./data/cache/llm"
+    LLM_CACHE_TTL: int = 604800  # 7 days
+
     # NLP Configuration
     SPACY_MODEL: str = "en_core_web_sm"
     MIN_CHARACTER_MENTIONS: int = 5
@@ -1,4 +1,5 @@
 # RAG Module
 from .rag_service import RAGService
+from .registry import rag
 
-__all__ = ['RAGService']
+__all__ = ['RAGService', 'rag']
@@ -4,13 +4,86 @@ Handles vector embeddings and retrieval for story context
 """
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional
 import logging
+import os
+import threading
 import uuid
 
 logger = logging.getLogger(__name__)
 
+class SingleThreadONNXMiniLM(ONNXMiniLM_L6_V2):
+    """
+    Chroma's default MiniLM embedder with ONNX Runtime pinned to one thread
+    
+    The stock session uses every core per call, which scales negatively
+    when several embedding calls run at once.
+    """
+    
+    def _init_model_and_tokenizer(self) -> None:
+        # The base class loads the tokenizer and model together, only while
+        # both are still None, so let it run and then swap in a one-thread
+        # session instead of shadowing model
+        if self.model is not None:
+            return
+        super()._init_model_and_tokenizer()
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        so.intra_op_num_threads = 1
+        so.inter_op_num_threads = 1
+        self.model = self.ort.InferenceSession(
+            os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx"),
+            providers=self._preferred_providers,
+            sess_options=so
+        )
+
+# Chunks per embedding call; calls for one batch run in parallel
+EMBED_BATCH_SIZE = 32
+
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=min(8, os.cpu_count() or 1),
+    thread_name_prefix="rag-embed"
+)
+
+_embedding_function: Optional[SingleThreadONNXMiniLM] = None
+_embedding_function_lock = threading.Lock()
+_embedding_warm = False
+_embedding_warm_lock = threading.Lock()
+
+def get_embedding_function() -> SingleThreadONNXMiniLM:
+    """Get the process-wide embedding function, creating it on first use"""
+    global _embedding_function
+    if _embedding_function is None:
+        with _embedding_function_lock:
+            if _embedding_function is None:
+                _embedding_function = SingleThreadONNXMiniLM(
+                    preferred_providers=["CPUExecutionProvider"]
+                )
+    return _embedding_function
+
+def warm_embedding_function() -> None:
+    """
+    Download and load the embedding model once, before it is used concurrently
+    
+    The model's first call downloads and loads it without any locking of its
+    own, so this runs one embed under a lock first. A failure is only logged
+    (and retried on the next call) so it never breaks non-RAG routes.
+    """
+    global _embedding_warm
+    if _embedding_warm:
+        return
+    with _embedding_warm_lock:
+        if _embedding_warm:
+            return
+        try:
+            get_embedding_function()(["warmup"])
+            _embedding_warm = True
+        except Exception as e:
+            logger.warning(f"Embedding model warmup failed: {e}")
+
 class RAGService:
     """Manages vector embeddings and retrieval for story chunks"""
     
@@ -35,13 +108,18 @@ class RAGService:
         
         # Get or create collection
         self.collection_name = "story_chunks"
+        self.embedding_function = get_embedding_function()
         try:
-            self.collection = self.client.get_collection(name=self.collection_name)
+            self.collection = self.client.get_collection(
+                name=self.collection_name,
+                embedding_function=self.embedding_function
+            )
             logger.info(f"Loaded existing collection: {self.collection_name}")
         except:
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}  # Use cosine similarity
+                metadata={"hnsw:space": "cosine"},  # Use cosine similarity
+                embedding_function=self.embedding_function
             )
             logger.info(f"Created new collection: {self.collection_name}")
     
@@ -66,33 +144,97 @@ class RAGService:
             logger.warning(f"No chunks provided for document {document_id}")
             return 0
         
+        extra_metadata = {"chunk_total": len(chunks)}
+        if metadata:
+            extra_metadata.update(metadata)
+        
+        return self.add_chunk_batch(document_id, chunks, start_index=0, metadata=extra_metadata)
+    
+    def add_chunk_batch(
+        self,
+        document_id: str,
+        chunks: List[str],
+        start_index: int = 0,
+        metadata: Optional[Dict] = None
+    ) -> int:
+        """
+        Add one batch of a document's chunks to vector store
+        
+        Used to index a document incrementally while it is still being
+        chunked; chunk_total is unknown at that point and is not recorded.
+        
+        Args:
+            document_id: Unique identifier for the document
+            chunks: Consecutive text chunks
+            start_index: Document-wide index of the first chunk in the batch
+            metadata: Optional metadata for the document
+            
+        Returns:
+            Number of chunks added
+        """
+        if not chunks:
+            return 0
+        
         # Prepare data for ChromaDB
-        ids = [f"{document_id}_chunk_{i}" for i in range(len(chunks))]
+        ids = [f"{document_id}_chunk_{start_index + i}" for i in range(len(chunks))]
         metadatas = []
         
-        for i, chunk in enumerate(chunks):
+        for i in range(len(chunks)):
             chunk_metadata = {
                 "document_id": document_id,
-                "chunk_index": i,
-                "chunk_total": len(chunks)
+                "chunk_index": start_index + i
             }
             if metadata:
                 chunk_metadata.update(metadata)
             metadatas.append(chunk_metadata)
         
-        # Add to collection (ChromaDB handles embedding automatically)
+        warm_embedding_function()
+        
+        # Embed sub-batches in parallel and insert each one as it completes,
+        # so Chroma's serial insert never waits on more than one embedding call
+        starts = range(0, len(chunks), EMBED_BATCH_SIZE)
         try:
-            self.collection.add(
-                ids=ids,
-                documents=chunks,
-                metadatas=metadatas
-            )
+            futures = [
+                _embedding_executor.submit(self.embedding_function, chunks[start:start + EMBED_BATCH_SIZE])
+                for start in starts
+            ]
+            for start, future in zip(starts, futures):
+                end = start + EMBED_BATCH_SIZE
+                try:
+                    embeddings = future.result()
+                except Exception as embed_error:
+                    embeddings = self._embed_split(chunks[start:end], embed_error)
+                self.collection.add(
+                    ids=ids[start:end],
+                    documents=chunks[start:end],
+                    metadatas=metadatas[start:end],
+                    embeddings=embeddings
+                )
             logger.info(f"Added {len(chunks)} chunks for document {document_id}")
             return len(chunks)
         except Exception as e:
             logger.error(f"Error adding chunks to vector store: {e}")
             raise
     
+    def _embed_split(self, texts: List[str], error: Exception) -> List:
+        """
+        Embed texts whose embedding call failed, in halves
+        
+        Each half that fails is split again, isolating the chunk the model
+        fails on; error is raised once a single chunk fails.
+        """
+        if len(texts) == 1:
+            raise error
+        logger.warning(f"Embedding {len(texts)} chunks failed, retrying in halves: {error}")
+        middle = len(texts) // 2
+        embeddings = []
+        for half in (texts[:middle], texts[middle:]):
+            try:
+                embeddings.extend(self.embedding_function(half))
+            except Exception as half_error:
+                embeddings.extend(self._embed_split(half, half_error))
+        return embeddings
+    
     def search_relevant_context(
         self, 
         query: str, 
@@ -116,6 +258,8 @@ class RAGService:
             if document_id:
                 where_clause = {"document_id": document_id}
             
+            warm_embedding_function()
+            
             # Query the collection
             results = self.collection.query(
                 query_texts=[query],
@@ -141,19 +285,32 @@ class RAGService:
             logger.error(f"Error searching vector store: {e}")
             return []
     
-    def get_document_chunks(self, document_id: str) -> List[Dict]:
+    def get_document_chunks(
+        self,
+        document_id: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include_metadata: bool = True
+    ) -> List[Dict]:
         """
-        Get all chunks for a specific document
+        Get chunks for a specific document, optionally one page at a time
         
         Args:
             document_id: Document identifier
+            limit: Maximum number of chunks to return (None for all)
+            offset: Number of chunks to skip
+            include_metadata: Whether to fetch chunk metadata
             
         Returns:
-            List of all chunks for the document
+            List of chunks for the document
         """
         try:
+            include = ["documents", "metadatas"] if include_metadata else ["documents"]
             results = self.collection.get(
-                where={"document_id": document_id}
+                where={"document_id": document_id},
+                limit=limit,
+                offset=offset or None,
+                include=include
             )
             
             chunks = []
@@ -161,7 +318,7 @@ class RAGService:
                 for i, doc in enumerate(results['documents']):
                     chunks.append({
                         'text': doc,
-                        'metadata': results['metadatas'][i] if results['metadatas'] else {},
+                        'metadata': results['metadatas'][i] if results.get('metadatas') else {},
                         'id': results['ids'][i] if results['ids'] else None
                     })
             
@@ -0,0 +1,20 @@
+"""
+RAG Service Registry
+Provides one shared RAGService (and Chroma client) per process
+"""
+from typing import Optional
+import threading
+
+from src.rag.rag_service import RAGService
+
+_instance: Optional[RAGService] = None
+_lock = threading.Lock()
+
+def rag() -> RAGService:
+    """Get the process-wide RAGService, creating it on first use"""
+    global _instance
+    if _instance is None:
+        with _lock:
+            if _instance is None:
+                _instance = RAGService()
+    return _instance
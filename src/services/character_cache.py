@@ -2,11 +2,14 @@
 Character Cache Service
 Stores and retrieves extracted characters to avoid re-extraction
 """
-import json
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import copy
 import logging
 
+from src.utils import fast_json
+from src.utils.atomic_write import atomic_write_bytes
+
 logger = logging.getLogger(__name__)
 
 class CharacterCache:
@@ -21,11 +24,39 @@ class CharacterCache:
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # In-memory copy of each document's characters plus a character_id
+        # index, stored with the cache file's mtime so external rewrites
+        # invalidate it. Callers only ever get deep copies, so editing a
+        # returned character can't change what later requests see.
+        self._index: Dict[str, Tuple[int, List[Dict], Dict[str, Dict]]] = {}
     
     def _get_cache_path(self, document_id: str) -> Path:
         """Get cache file path for a document"""
         return self.cache_dir / f"{document_id}_characters.json"
     
+    def _build_index(self, document_id: str, characters: List[Dict], cache_path: Path) -> None:
+        """Stash a document's characters and their character_id lookup table"""
+        # setdefault keeps the first character with a given ID, as a linear scan would
+        by_id: Dict[str, Dict] = {}
+        for c in characters:
+            if c.get('character_id'):
+                by_id.setdefault(c['character_id'], c)
+        self._index[document_id] = (cache_path.stat().st_mtime_ns, characters, by_id)
+    
+    def _get_indexed(self, document_id: str) -> Optional[Tuple[int, List[Dict], Dict[str, Dict]]]:
+        """Get the in-memory entry for a document if the cache file hasn't changed since"""
+        entry = self._index.get(document_id)
+        if entry is None:
+            return None
+        try:
+            if self._get_cache_path(document_id).stat().st_mtime_ns == entry[0]:
+                return entry
+        except OSError:
+            pass
+        self._index.pop(document_id, None)
+        return None
+    
     def save_characters(self, document_id: str, characters: List[Dict]) -> bool:
         """
         Save extracted characters to cache
@@ -46,9 +77,9 @@ class CharacterCache:
                 "character_count": len(characters)
             }
             
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, indent=2, ensure_ascii=False)
+            atomic_write_bytes(cache_path, fast_json.dumps(cache_data, indent=True))
             
+            self._build_index(document_id, copy.deepcopy(characters), cache_path)
             logger.info(f"Cached {len(characters)} characters for document {document_id}")
             return True
             
@@ -66,6 +97,10 @@ class CharacterCache:
         Returns:
             List of characters or None if not cached
         """
+        entry = self._get_indexed(document_id)
+        if entry is not None:
+            return copy.deepcopy(entry[1])
+        
         try:
             cache_path = self._get_cache_path(document_id)
             
@@ -73,10 +108,11 @@ class CharacterCache:
                 logger.info(f"No cache found for document {document_id}")
                 return None
             
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
+            cache_data = fast_json.loads(cache_path.read_bytes())
             
             characters = cache_data.get('characters', [])
+            self._build_index(document_id, characters, cache_path)
+            characters = copy.deepcopy(characters)
             logger.info(f"Loaded {len(characters)} characters from cache for document {document_id}")
             return characters
             
@@ -95,16 +131,14 @@ class CharacterCache:
         Returns:
             Character dictionary or None if not found
         """
-        characters = self.load_characters(document_id)
-        
-        if not characters:
-            return None
-        
-        for char in characters:
-            if char.get('character_id') == character_id:
-                return char
+        # Reuse the index if the cache file hasn't changed since it was built
+        entry = self._get_indexed(document_id)
+        if entry is None:
+            if not self.load_characters(document_id):
+                return None
+            entry = self._index[document_id]
         
-        return None
+        return copy.deepcopy(entry[2].get(character_id))
     
     def cache_exists(self, document_id: str) -> bool:
         """
@@ -131,6 +165,7 @@ class CharacterCache:
         """
         try:
             cache_path = self._get_cache_path(document_id)
+            self._index.pop(document_id, None)
             
             if cache_path.exists():
                 cache_path.unlink()
@@ -1,144 +1,518 @@
-from typing import List, Dict, Set, Tuple
+from typing import Any, Callable, List, Dict, FrozenSet, Optional, Set, Tuple
 # OpenAI import - commented for future use when key is purchased
 # from openai import OpenAI
 import google.generativeai as genai
-import json
+from google.api_core import exceptions as google_exceptions
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, stop_after_delay, wait_exponential_jitter
+import asyncio
 import logging
 import re
-from difflib import SequenceMatcher
+import threading
+from functools import lru_cache
+
+try:
+    from rapidfuzz import fuzz
+except ImportError:  # pragma: no cover - depends on environment
+    fuzz = None
+    from difflib import SequenceMatcher
 
 from src.config import settings
+from src.services.gemini_client import configure_gemini, request_options
+from src.services.llm_cache import LLMCache
+from src.utils import fast_json
 
 logger = logging.getLogger(__name__)
 
+# Blacklist of non-character terms (insults, titles, groups)
+NON_CHARACTER_TERMS = frozenset({
+    "idiot", "fool", "princess", "your majesty", "majesty",
+    "bloodstained queen", "bloody reina", "reina",
+    "lieutenant", "captain", "commander", "colonel",
+    "eighty-six", "soldiers", "troops", "children",
+    "boy", "girl", "stranger", "enemy", "friend",
+    "handler", "officer", "general", "master", "mistress",
+    "lord", "lady", "sir", "madam", "miss", "mr", "mrs", "ms",
+    "weakest", "strongest"  # Descriptive adjectives, not names
+})
+
+# Descriptive phrases, bare ranks and group references that aren't names,
+# combined into one alternation so each name is scanned once
+NON_CHARACTER_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in (
+    r'.*\s+(weakest|strongest|best|worst|greatest|lowest)\s+.*',  # "world's weakest hero"
+    r'.*the\s+(weakest|strongest|best|worst|greatest|lowest).*',   # "the strongest hunter"
+    r'.*of\s+the\s+.*',                           # "king of the hill"
+    r'.*who\s+.*',                                 # "one who"
+    r'.*that\s+.*',                               # "person that"
+    # "the world's weakest hunter"
+    r'^(the\s+)?(world|world\'s|kingdom|realm|land)\'?s?\s+(weakest|strongest|best|worst|greatest|lowest)\s+.*',
+    r'^(the\s+)?(lieutenant|captain|commander|colonel|general|officer|handler)\s*(one|two|three)?$',  # bare rank
+    r'^(the\s+)?(soldiers|troops|children|enemies|friends|group|squad|unit)$',  # group reference
+)), re.IGNORECASE)
+
+# Callsigns/titles used as names (e.g. "Handler One", "The Undertaker")
+TITLE_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in (
+    r'^(the\s+)?handler\s+(one|two|three|four|five|1|2|3|4|5)',
+    r'^(the\s+)?(captain|commander|lieutenant|colonel|general|officer)',
+    r'^(the\s+)?(undertaker|reaper|handler|observer|striker)',
+    r'^(sir|madam|lord|lady|master|mistress)\s+\w+',
+)))
+
+NAME_PUNCTUATION_PATTERN = re.compile(r'[^\w\s\-\']')
+
+# Deletes the ASCII characters NAME_PUNCTUATION_PATTERN removes (for ASCII-only names)
+NAME_PUNCTUATION_TABLE = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128)
+    if not (chr(c).isalnum() or chr(c).isspace() or chr(c) in "_-'")
+))
+PARENTHETICAL_PATTERN = re.compile(r'\([^)]*\)')
+QUOTE_PATTERN = re.compile(r'["\']')
+# Deletes every ASCII character not allowed in a character ID slug
+# (non-ASCII is dropped by encoding first)
+SLUG_DELETE_TABLE = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if not (chr(c).isdigit() or 'a' <= chr(c) <= 'z' or chr(c) == '_')
+))
+WORD_PATTERN = re.compile(r"[\w\-']+")
+# Up to this many characters, _merge_characters compares every pair exactly
+# like the unblocked merge did; blocking only kicks in for larger lists
+MERGE_ALL_PAIRS_LIMIT = 200
+
+# Runs of CJK, kana, Hangul and fullwidth characters, which cost about a
+# token each instead of the ~4 characters per token of English text
+WIDE_CHAR_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]+')
+CHARS_PER_TOKEN = 4
+
+# Standing instructions for character extraction, sent as the system
+# instruction so each request only carries the story text
+EXTRACTION_RULES = """You are an expert at extracting character names from novels.
+
+Extract ALL name variations for each character from the text you are given. A character may appear as:
+- Full name: "Sung Jinwoo", "Vladilena Milizé"
+- First name only: "Jinwoo", "Lena"
+- Last name only: "Sung"
+- Nicknames: "Lena", "Shin"
+- Callsigns/Titles: "Handler One", "The Undertaker"
+
+EXTRACTION RULES:
+
+1. WHAT TO EXTRACT (YES):
+   ✓ Actual character names (proper nouns): "Sung Jinwoo", "Joohee Lee", "Shinei Nouzen"
+   ✓ Nicknames used as names: "Shin", "Lena", "Jinwoo"
+   ✓ Callsigns/titles when used AS A NAME: "Undertaker", "Handler One"
+   ✓ Name variations: "Sung Jinwoo" AND "Jinwoo" AND "Sung" (list separately)
+
+2. WHAT TO IGNORE (NO):
+   ✗ Descriptive phrases: "World's Weakest Hunter", "The Strongest"
+   ✗ Insults/mockery: "idiot", "fool", "weakling"
+   ✗ Generic titles: "the captain", "the queen" (without name)
+   ✗ Group references: "the soldiers", "hunters", "guild members"
+   ✗ Generic terms: "boy", "girl", "stranger", "person"
+
+3. IMPORTANT: List each name variation SEPARATELY
+   - If a character is called "Sung Jinwoo", "Jinwoo", and "Sung" → create 3 entries
+   - If a character has callsign "Undertaker" and name "Shin" → create 2 entries
+   - The merging system will combine them later
+
+4. For each name, provide:
+   - "name": The exact name/nickname/callsign as it appears
+   - "description": WHO this person is (1 sentence, based on text)
+   - "role": "protagonist" / "supporting" / "antagonist" (based on text)
+
+"""
+
+EXTRACTION_INSTRUCTIONS = EXTRACTION_RULES + """OUTPUT FORMAT (JSON only):
+[
+  {
+    "name": "Sung Jinwoo",
+    "description": "An E-rank hunter who receives mysterious daily quests",
+    "role": "protagonist"
+  },
+  {
+    "name": "Jinwoo",
+    "description": "An E-rank hunter who receives mysterious daily quests",
+    "role": "protagonist"
+  },
+  {
+    "name": "Joohee Lee",
+    "description": "A healing spellcaster who worries about Jinwoo",
+    "role": "supporting"
+  },
+  {
+    "name": "Joohee",
+    "description": "A healing spellcaster who worries about Jinwoo",
+    "role": "supporting"
+  }
+]
+
+Return ONLY the JSON array."""
+
+# Structured-output schema for character extraction responses
+CHARACTER_LIST_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "name": {"type": "STRING"},
+            "description": {"type": "STRING"},
+            "role": {"type": "STRING", "enum": ["protagonist", "supporting", "antagonist"]}
+        },
+        "required": ["name", "description", "role"]
+    }
+}
+
+# Structured-output schemas for personality summaries (single and grouped)
+PERSONALITY_PROPERTIES = {
+    "personality_traits": {"type": "ARRAY", "items": {"type": "STRING"}},
+    "behavior_summary": {"type": "STRING"},
+    "motivations": {"type": "STRING"},
+    "character_arc": {"type": "STRING"},
+    "defining_moments": {"type": "ARRAY", "items": {"type": "STRING"}}
+}
+
+PERSONALITY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": PERSONALITY_PROPERTIES,
+    "required": list(PERSONALITY_PROPERTIES)
+}
+
+PERSONALITY_GROUP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "profiles": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"name": {"type": "STRING"}, **PERSONALITY_PROPERTIES},
+                "required": ["name", *PERSONALITY_PROPERTIES]
+            }
+        }
+    },
+    "required": ["profiles"]
+}
+
+# Character extraction plus personality profiles in one response, so the
+# story excerpt is only sent once when both are needed
+COMBINED_INSTRUCTIONS = EXTRACTION_RULES + """5. Also write ONE personality profile for each distinct character
+   (not for each name variation), using the character's fullest name. Include:
+   - Key personality traits (e.g., brave, curious, kind, stubborn)
+   - Behavioral patterns and how they interact with others
+   - Motivations and goals
+   - Character arc or development (if visible in this excerpt)
+   - Notable quotes or actions that define them
+
+OUTPUT FORMAT (JSON only):
+{
+  "characters": [
+    {
+      "name": "Sung Jinwoo",
+      "description": "An E-rank hunter who receives mysterious daily quests",
+      "role": "protagonist"
+    },
+    {
+      "name": "Jinwoo",
+      "description": "An E-rank hunter who receives mysterious daily quests",
+      "role": "protagonist"
+    }
+  ],
+  "profiles": [
+    {
+      "name": "Sung Jinwoo",
+      "personality_traits": ["trait1", "trait2", "trait3"],
+      "behavior_summary": "2-3 sentence summary of how they behave and interact",
+      "motivations": "What drives this character",
+      "character_arc": "How they change or develop in the story",
+      "defining_moments": ["quote or action 1", "quote or action 2"]
+    }
+  ]
+}
+
+Return ONLY the JSON object."""
+
+COMBINED_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "characters": CHARACTER_LIST_SCHEMA,
+        "profiles": PERSONALITY_GROUP_SCHEMA["properties"]["profiles"]
+    },
+    "required": ["characters", "profiles"]
+}
+
+class ExtractedCharacter(BaseModel):
+    """One name variation returned by character extraction"""
+    name: str = Field(min_length=1)
+    description: str = ""
+    role: str = "supporting"
+
+ExtractedCharacterList = TypeAdapter(List[ExtractedCharacter])
+
+class CombinedExtraction(BaseModel):
+    """Characters and personality profiles returned by a combined extraction"""
+    characters: List[ExtractedCharacter]
+    profiles: List[Dict[str, Any]] = []
+
+# Transient Gemini API failures (rate limits, overload) retried with backoff
+TRANSIENT_LLM_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+# Retrying also stops after 90 s in total, so with GEMINI_REQUEST_TIMEOUT
+# per call one request can't hold an HTTP request for minutes
+llm_retry = retry(
+    wait=wait_exponential_jitter(initial=1, max=30),
+    stop=stop_after_attempt(5) | stop_after_delay(90),
+    retry=retry_if_exception_type(TRANSIENT_LLM_ERRORS),
+    reraise=True
+)
+
 class CharacterService:
     """Extract character names using LLM (OpenAI or Gemini)"""
     
+    # Leading characters of the story sent to the LLM (English-text sizes;
+    # see _sample_text for scripts that use more tokens per character)
+    EXTRACTION_SAMPLE_CHARS = 15000
+    PERSONALITY_SAMPLE_CHARS = 10000
+    NER_SAMPLE_CHARS = 8000
+    
+    # Bump when prompts change so cached LLM results from old prompts are ignored
+    PROMPT_VERSION = "2"
+    
+    # spaCy pipeline shared by all instances (False once loading has failed)
+    _nlp = None
+    
     def __init__(self):
         # OpenAI client - commented for future use
         # self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
         
         # Gemini client - currently active
         self.gemini_model = None
+        self.extraction_model = None
+        self.combined_model = None
         if settings.AI_PROVIDER == "gemini":
             if not settings.GEMINI_API_KEY:
                 logger.error("GEMINI_API_KEY not found in settings. Please add it to your .env file.")
             else:
                 try:
-                    genai.configure(api_key=settings.GEMINI_API_KEY)
-                    self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
+                    configure_gemini()
+                    # Every call here expects JSON, so let Gemini guarantee it
+                    self.gemini_model = genai.GenerativeModel(
+                        settings.GEMINI_MODEL,
+                        generation_config={"response_mime_type": "application/json"}
+                    )
+                    # Extraction rules live in the system instruction and the
+                    # response is constrained to the character list schema
+                    self.extraction_model = genai.GenerativeModel(
+                        settings.GEMINI_MODEL,
+                        system_instruction=EXTRACTION_INSTRUCTIONS,
+                        generation_config={
+                            "response_mime_type": "application/json",
+                            "response_schema": CHARACTER_LIST_SCHEMA
+                        }
+                    )
+                    self.combined_model = genai.GenerativeModel(
+                        settings.GEMINI_MODEL,
+                        system_instruction=COMBINED_INSTRUCTIONS,
+                        generation_config={
+                            "response_mime_type": "application/json",
+                            "response_schema": COMBINED_SCHEMA
+                        }
+                    )
                     logger.info("Gemini model initialized successfully")
                 except Exception as e:
                     logger.error(f"Failed to initialize Gemini: {e}")
         
-        # Blacklist of non-character terms (insults, titles, groups)
-        self.non_character_terms = {
-            "idiot", "fool", "princess", "your majesty", "majesty",
-            "bloodstained queen", "bloody reina", "reina",
-            "lieutenant", "captain", "commander", "colonel",
-            "eighty-six", "soldiers", "troops", "children",
-            "boy", "girl", "stranger", "enemy", "friend",
-            "handler", "officer", "general", "master", "mistress",
-            "lord", "lady", "sir", "madam", "miss", "mr", "mrs", "ms",
-            "weakest", "strongest"  # Descriptive adjectives, not names
-        }
+        # Content-addressed cache of LLM results, so re-running on the same text is free
+        self.llm_cache = LLMCache(settings.LLM_CACHE_DIR, ttl_seconds=settings.LLM_CACHE_TTL)
+    
+    def _cache_key(self, *parts: str) -> str:
+        """Hash the provider, model, prompt version and inputs that determine an LLM result"""
+        return LLMCache.make_key(settings.AI_PROVIDER, settings.GEMINI_MODEL, self.PROMPT_VERSION, *parts)
+    
+    def _load_cached_result(self, key: str) -> Optional[Any]:
+        """Load a cached LLM result, or None on a miss"""
+        return self.llm_cache.get(key)
+    
+    def _save_cached_result(self, key: str, result: Any) -> None:
+        """Store an LLM result in the cache"""
+        self.llm_cache.set(key, result, model=settings.GEMINI_MODEL, prompt_version=self.PROMPT_VERSION)
+    
+    @staticmethod
+    def _schema_config(schema: Optional[Dict]) -> Optional[Dict]:
+        """Per-call generation config adding a response schema (None keeps the model's own)"""
+        if schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": schema}
+    
+    @llm_retry
+    def _generate(self, prompt: str, model: Optional[Any] = None, schema: Optional[Dict] = None) -> str:
+        """
+        Call Gemini and return the response text, retrying transient API errors
         
-        # Patterns that indicate descriptive phrases (not names)
-        # These catch phrases like "World's Weakest Hero", "The Strongest Hunter"
-        self.descriptive_patterns = [
-            r'.*\s+(weakest|strongest|best|worst|greatest|lowest)\s+.*',  # "world's weakest hero"
-            r'.*the\s+(weakest|strongest|best|worst|greatest|lowest).*',   # "the strongest hunter"
-            r'.*of\s+the\s+.*',                           # "king of the hill"
-            r'.*who\s+.*',                                 # "one who"
-            r'.*that\s+.*',                               # "person that"
-        ]
+        Args:
+            prompt: Prompt text
+            model: Model to call (defaults to the general JSON-mode model)
+            schema: Optional response schema to constrain the JSON output
+        """
+        response = (model or self.gemini_model).generate_content(
+            prompt,
+            generation_config=self._schema_config(schema),
+            request_options=request_options()
+        )
+        return response.text.strip()
+    
+    @llm_retry
+    async def _agenerate(self, prompt: str, model: Optional[Any] = None, schema: Optional[Dict] = None) -> str:
+        """Async version of _generate"""
+        response = await (model or self.gemini_model).generate_content_async(
+            prompt,
+            generation_config=self._schema_config(schema),
+            request_options=request_options()
+        )
+        return response.text.strip()
+    
+    def _loads_with_repair(
+        self,
+        content: str,
+        validate: Optional[Callable[[Any], Any]] = None,
+        max_repairs: int = 2
+    ) -> Any:
+        """
+        Parse (and optionally validate) a JSON-mode LLM response, feeding the
+        error back to the model to repair its output if it's invalid
+        
+        Only the broken output and the error are resent, not the story text.
+        
+        Args:
+            content: Response text
+            validate: Called with the parsed data; returns the validated value
+                or raises ValidationError
+            max_repairs: Repair requests before giving up
+            
+        Raises:
+            JSONDecodeError: If the last response doesn't parse
+            ValidationError: If the last response doesn't validate
+        """
+        for attempt in range(max_repairs + 1):
+            try:
+                data = fast_json.loads(content)
+                return validate(data) if validate else data
+            except (fast_json.JSONDecodeError, ValidationError) as e:
+                if attempt == max_repairs:
+                    raise
+                logger.warning(f"LLM returned invalid output ({e}), requesting repair {attempt + 1}/{max_repairs}")
+                error = e
+            
+            repair_prompt = f"""The following output was rejected with this error:
+{error}
+
+Return the same data as valid JSON only, fixing the error without otherwise changing its content.
+
+{content}"""
+            content = self._generate(repair_prompt)
+    
+    @staticmethod
+    def _validate_characters(data: Any) -> List[Dict]:
+        """Validate an extraction response, filling in missing optional fields"""
+        return [char.model_dump() for char in ExtractedCharacterList.validate_python(data)]
     
     def _is_non_character(self, name: str) -> bool:
         """Check if name is in blacklist of non-character terms or is a descriptive phrase"""
         normalized = self._normalize_name(name)
         
         # Check exact match
-        if normalized in self.non_character_terms:
+        if normalized in NON_CHARACTER_TERMS:
             return True
         
         # Check if it's a descriptive phrase containing blacklisted adjectives
         # (e.g., "world weakest hero" contains "weakest")
-        name_words = set(normalized.split())
-        if name_words.intersection(self.non_character_terms):
-            # If it's a multi-word phrase (3+ words) with descriptive adjectives, it's likely a description
-            # Single or two-word names are more likely to be actual names
-            if len(name_words) >= 3:  # Multi-word phrases with descriptive terms are likely descriptions
+        # Multi-word phrases (3+ distinct words) with descriptive terms are likely descriptions;
+        # single or two-word names are more likely to be actual names
+        name_words = normalized.split()
+        if len(name_words) >= 3 and not NON_CHARACTER_TERMS.isdisjoint(name_words):
+            if len(set(name_words)) >= 3:
                 return True
         
-        # Check if it matches descriptive phrase patterns
-        for pattern in self.descriptive_patterns:
-            if re.match(pattern, normalized, re.IGNORECASE):
-                return True
-        
-        # Check if it's purely a title/rank
-        title_pattern = r'^(the\s+)?(lieutenant|captain|commander|colonel|general|officer|handler)\s*(one|two|three)?$'
-        if re.match(title_pattern, normalized):
-            return True
-        
-        # Check if it's a group reference
-        group_pattern = r'^(the\s+)?(soldiers|troops|children|enemies|friends|group|squad|unit)$'
-        if re.match(group_pattern, normalized):
-            return True
-        
-        # Check if it's a descriptive phrase (contains "the" + adjective + noun pattern)
-        descriptive_pattern = r'^(the\s+)?(world|world\'s|kingdom|realm|land)\'?s?\s+(weakest|strongest|best|worst|greatest|lowest)\s+.*'
-        if re.match(descriptive_pattern, normalized, re.IGNORECASE):
-            return True
-        
-        return False
+        # Check descriptive phrase, bare rank and group reference patterns
+        # (e.g., "the world's weakest hunter", "the captain", "the soldiers")
+        return NON_CHARACTER_PATTERN.match(normalized) is not None
     
-    def _normalize_name(self, name: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _normalize_name(name: str) -> str:
         """Normalize name for comparison (lowercase, strip whitespace, remove punctuation)"""
         # Remove punctuation except hyphens and apostrophes
-        normalized = re.sub(r'[^\w\s\-\']', '', name.lower())
+        lowered = name.lower()
+        if lowered.isascii():
+            normalized = lowered.translate(NAME_PUNCTUATION_TABLE)
+        else:
+            normalized = NAME_PUNCTUATION_PATTERN.sub('', lowered)
         return ' '.join(normalized.split())  # Normalize whitespace
     
+    @staticmethod
+    def _slugify(name: str) -> str:
+        """Turn a name into a character ID slug (lowercase ASCII letters, digits, underscores)"""
+        slug = CharacterService._normalize_name(name).replace(' ', '_')
+        return slug.encode('ascii', 'ignore').decode('ascii').translate(SLUG_DELETE_TABLE)
+    
     def _calculate_similarity(self, str1: str, str2: str) -> float:
         """Calculate similarity between two strings (0.0 to 1.0)"""
+        if fuzz is not None:
+            return fuzz.ratio(str1, str2) / 100
         return SequenceMatcher(None, str1, str2).ratio()
     
+    def _is_similar(self, str1: str, str2: str, threshold: float, strict: bool = False) -> bool:
+        """
+        Check whether similarity reaches threshold (or exceeds it, if strict)
+        
+        The ratio is at most 2 * min(len) / (len1 + len2), so strings of
+        very different lengths are rejected without comparing them.
+        """
+        total = len(str1) + len(str2)
+        if not total or 2 * min(len(str1), len(str2)) < threshold * total:
+            return False
+        similarity = self._calculate_similarity(str1, str2)
+        return similarity > threshold if strict else similarity >= threshold
+    
     def _is_name_subset(self, short: str, long: str) -> bool:
         """Check if short name is a subset of long name (e.g., 'Shin' in 'Shinei Nouzen')"""
-        short_parts = set(short.lower().split())
-        long_parts = set(long.lower().split())
-        
-        # Check if any part of short name appears in long name
-        for short_part in short_parts:
-            for long_part in long_parts:
+        return self._words_overlap(set(short.lower().split()), set(long.lower().split()))
+    
+    def _words_overlap(self, words1: Set[str], words2: Set[str]) -> bool:
+        """Check if any word of one name contains, or closely matches, a word of the other"""
+        for short_part in words1:
+            for long_part in words2:
                 # Direct substring match
                 if short_part in long_part or long_part in short_part:
                     return True
                 # High similarity match
-                if self._calculate_similarity(short_part, long_part) > 0.85:
+                if self._is_similar(short_part, long_part, 0.85, strict=True):
                     return True
         return False
     
     def _is_title_pattern(self, name: str) -> bool:
         """Check if name is a title pattern (e.g., 'Handler One', 'The Undertaker')"""
         normalized = name.lower()
-        
-        # Common title patterns
-        title_patterns = [
-            r'^(the\s+)?handler\s+(one|two|three|four|five|1|2|3|4|5)',
-            r'^(the\s+)?(captain|commander|lieutenant|colonel|general|officer)',
-            r'^(the\s+)?(undertaker|reaper|handler|observer|striker)',
-            r'^(sir|madam|lord|lady|master|mistress)\s+\w+',
-        ]
-        
-        for pattern in title_patterns:
-            if re.match(pattern, normalized):
-                return True
-        return False
+        return TITLE_PATTERN.match(normalized) is not None
     
     def _fuzzy_match(self, name1: str, name2: str, threshold: float = 0.85) -> bool:
         """Check if two names are similar using fuzzy matching"""
-        norm1 = self._normalize_name(name1)
-        norm2 = self._normalize_name(name2)
+        return self._fuzzy_match_normalized(
+            self._normalize_name(name1), self._normalize_name(name2), threshold
+        )
+    
+    def _fuzzy_match_normalized(
+        self,
+        norm1: str,
+        norm2: str,
+        threshold: float = 0.85,
+        words1: Optional[Set[str]] = None,
+        words2: Optional[Set[str]] = None
+    ) -> bool:
+        """Fuzzy match two names that are already normalized (and optionally split into words)"""
+        if not norm1 or not norm2:
+            return False
         
         # Exact match
         if norm1 == norm2:
@@ -148,19 +522,21 @@ class CharacterService:
         if norm1 in norm2 or norm2 in norm1:
             return True
         
-        # Check name subset (e.g., "Shin" matches "Shinei Nouzen")
-        if self._is_name_subset(norm1, norm2) or self._is_name_subset(norm2, norm1):
+        if words1 is None:
+            words1 = set(norm1.split())
+        if words2 is None:
+            words2 = set(norm2.split())
+        
+        # Check name subset (e.g., "Shin" matches "Shinei Nouzen"); the
+        # check is symmetric, so one direction is enough
+        if self._words_overlap(words1, words2):
             return True
         
         # Fuzzy matching for similar names (typos, translations)
-        similarity = self._calculate_similarity(norm1, norm2)
-        if similarity >= threshold:
+        if self._is_similar(norm1, norm2, threshold):
             return True
         
         # Check word-by-word matching for multi-word names
-        words1 = set(norm1.split())
-        words2 = set(norm2.split())
-        
         # If they share at least one significant word (>3 chars)
         common_words = words1.intersection(words2)
         if common_words:
@@ -170,67 +546,108 @@ class CharacterService:
         
         return False
     
-    def _extract_name_parts(self, name: str) -> Set[str]:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _extract_name_parts(name: str) -> FrozenSet[str]:
         """Extract individual name parts (first, last, middle names)"""
         # Remove titles, callsigns in parentheses, etc.
-        cleaned = re.sub(r'\([^)]*\)', '', name)
-        cleaned = re.sub(r'["\']', '', cleaned)
+        cleaned = PARENTHETICAL_PATTERN.sub('', name)
+        cleaned = QUOTE_PATTERN.sub('', cleaned)
         
         # Split into parts
         parts = cleaned.split()
-        return {self._normalize_name(part) for part in parts if len(part) > 1}
+        return frozenset(CharacterService._normalize_name(part) for part in parts if len(part) > 1)
+    
+    def _name_features(self, char: Dict) -> Dict:
+        """Precompute the normalized forms used when comparing a character to others"""
+        name = char.get('name', '')
+        norm = self._normalize_name(name)
+        parts = self._extract_name_parts(name)
+        return {
+            'name': name,
+            'norm': norm,
+            'words': set(norm.split()),
+            'parts': parts,
+            # Parts long enough to identify a character on their own
+            'significant_parts': {part for part in parts if len(part) > 3},
+            'description': char.get('description', '').lower()
+        }
     
     def _are_same_character(self, char1: Dict, char2: Dict) -> bool:
         """
         Determine if two character dictionaries represent the same person
         Uses multiple heuristics: exact match, fuzzy match, name parts overlap, alias patterns
         """
-        name1 = char1.get('name', '')
-        name2 = char2.get('name', '')
-        
+        return self._features_match(self._name_features(char1), self._name_features(char2))
+    
+    def _features_match(self, feat1: Dict, feat2: Dict) -> bool:
+        """Compare two characters using features from _name_features()"""
         # Skip if either name is empty
-        if not name1 or not name2:
+        if not feat1['name'] or not feat2['name']:
             return False
         
+        norm1 = feat1['norm']
+        norm2 = feat2['norm']
+        
         # Direct fuzzy matching (handles nicknames, subsets, similarities)
-        if self._fuzzy_match(name1, name2):
+        if self._fuzzy_match_normalized(norm1, norm2, words1=feat1['words'], words2=feat2['words']):
+            return True
+        
+        # If they share significant name parts (>3 chars) - cheap, so before descriptions
+        if not feat1['significant_parts'].isdisjoint(feat2['significant_parts']):
             return True
         
         # Check if descriptions are very similar (same person described differently)
-        desc1 = char1.get('description', '').lower()
-        desc2 = char2.get('description', '').lower()
+        desc1 = feat1['description']
+        desc2 = feat2['description']
         
         if desc1 and desc2:
-            # If descriptions are highly similar, likely same character
-            desc_similarity = self._calculate_similarity(desc1, desc2)
-            if desc_similarity > 0.7:
-                return True
-            
             # Check if one name appears in the other's description
-            norm1 = self._normalize_name(name1)
-            norm2 = self._normalize_name(name2)
-            
             if norm1 in desc2 or norm2 in desc1:
                 return True
-        
-        # Check for common name parts (shared first or last name)
-        parts1 = self._extract_name_parts(name1)
-        parts2 = self._extract_name_parts(name2)
-        
-        # If they share significant name parts (>3 chars)
-        common_parts = parts1.intersection(parts2)
-        if common_parts:
-            significant_common = [p for p in common_parts if len(p) > 3]
-            if significant_common:
+            
+            # If descriptions are identical or highly similar, likely same character
+            # (similarity is the most expensive check, so last)
+            if desc1 == desc2 or self._is_similar(desc1, desc2, 0.7, strict=True):
                 return True
         
         return False
     
+    def _blocking_keys(self, feat: Dict) -> Set[str]:
+        """
+        Keys that any likely match shares with this character
+        
+        Name words, their 3-letter prefixes and every 2-letter substring
+        cover exact, nickname ("Shin"/"Shinei", "Lena"/"Vladilena") and
+        most typo matches: a word contained in another shares all of its
+        2-letter substrings. The whole description and its longer words are
+        keys too: the LLM often repeats one description for every variation
+        of a name, and descriptions similar enough to merge on share words.
+        """
+        words = feat['words'] | feat['parts']
+        keys = words | {word[:3] for word in words if len(word) > 3}
+        # Prefixed so a bigram can't collide with a 2-letter name word
+        keys.update('bigram:' + word[k:k + 2] for word in words for k in range(len(word) - 1))
+        if feat['description']:
+            # Prefixed so it can't collide with a name word
+            keys.add('description:' + feat['description'])
+            keys.update(
+                'description word:' + word
+                for word in WORD_PATTERN.findall(feat['description']) if len(word) > 3
+            )
+        return keys
+    
     def _merge_characters(self, characters: List[Dict]) -> List[Dict]:
         """
         Merge characters that represent the same person
         Adds 'aliases' field with all name variants
         Filters out non-character terms
+        
+        Lists of up to MERGE_ALL_PAIRS_LIMIT characters compare every pair.
+        Longer lists only compare characters sharing a blocking key (or whose
+        name appears in the other's description). That can miss typo matches
+        with no shared bigram, and description matches with no shared word
+        longer than 3 characters.
         """
         if not characters:
             return []
@@ -246,67 +663,215 @@ class CharacterService:
         if not filtered_characters:
             return []
         
-        merged = []
-        used_indices = set()
+        # Compute everything the comparisons need once per character
+        features = [self._name_features(char) for char in filtered_characters]
+        
+        compare_all = len(features) <= MERGE_ALL_PAIRS_LIMIT
+        
+        # Index characters by blocking key and by words of their descriptions
+        keys: List[Set[str]] = []
+        blocks: Dict[str, List[int]] = {}
+        mentions: Dict[str, List[int]] = {}
+        if not compare_all:
+            keys = [self._blocking_keys(feat) for feat in features]
+            for i, feat in enumerate(features):
+                for key in keys[i]:
+                    blocks.setdefault(key, []).append(i)
+                for word in set(WORD_PATTERN.findall(feat['description'])):
+                    mentions.setdefault(word, []).append(i)
+        
+        groups = []
+        # Characters not yet merged into a group
+        remaining = set(range(len(features)))
         
-        for i, char1 in enumerate(filtered_characters):
-            if i in used_indices:
+        for i, feat in enumerate(features):
+            if not remaining:
+                break
+            if i not in remaining:
                 continue
+            remaining.discard(i)
             
-            # Start with current character
-            main_char = char1.copy()
-            aliases = {char1['name']}
+            if compare_all:
+                candidates = remaining
+            else:
+                # Only compare against unmerged characters that could plausibly match
+                candidates = set()
+                for key in keys[i]:
+                    candidates.update(blocks[key])
+                for word in WORD_PATTERN.findall(feat['description']):
+                    candidates.update(blocks.get(word, ()))
+                for word in feat['words']:
+                    candidates.update(mentions.get(word, ()))
+                candidates &= remaining
             
             # Find all characters that match this one
-            for j, char2 in enumerate(filtered_characters):
-                if i != j and j not in used_indices:
-                    if self._are_same_character(char1, char2):
-                        aliases.add(char2['name'])
-                        used_indices.add(j)
-                        
-                        # Merge descriptions if char2 has more detail
-                        if len(char2.get('description', '')) > len(main_char.get('description', '')):
-                            main_char['description'] = char2['description']
-                        
-                        # Keep higher role priority (protagonist > supporting)
-                        if char2.get('role') == 'protagonist':
-                            main_char['role'] = 'protagonist'
+            members = [i]
+            members.extend(j for j in sorted(candidates) if self._features_match(feat, features[j]))
+            remaining.difference_update(members)
             
-            # Smart canonical name selection
-            # Priority: Full names > First names > Callsigns > Nicknames
+            groups.append(members)
+        
+        merged = []
+        for members in groups:
+            char1 = filtered_characters[members[0]]
             
-            # 1. Find full names (contains space, multiple words)
-            full_names = [name for name in aliases if ' ' in name and len(name.split()) >= 2]
+            # Start with the first character of the group
+            main_char = char1.copy()
+            aliases = {char1['name']}
             
-            # 2. Find single-word names (first names)
-            single_names = [name for name in aliases if ' ' not in name and len(name) > 2]
+            for j in members[1:]:
+                char2 = filtered_characters[j]
+                aliases.add(char2['name'])
+                
+                # Merge descriptions if char2 has more detail
+                if len(char2.get('description', '')) > len(main_char.get('description', '')):
+                    main_char['description'] = char2['description']
+                
+                # Keep higher role priority (protagonist > supporting)
+                if char2.get('role') == 'protagonist':
+                    main_char['role'] = 'protagonist'
             
-            # 3. Find callsigns/titles
-            titles = [name for name in aliases if self._is_title_pattern(name)]
+            # Smart canonical name selection
+            # Priority: Full names > First names > Callsigns > Nicknames
+            # Aliases are scanned in sorted order so ties resolve the same way every run
+            sorted_aliases = sorted(aliases)
+            best_full = best_single = None
+            for name in sorted_aliases:
+                if ' ' in name:
+                    # Full names (contains space, multiple words): prefer the longest (most complete)
+                    if len(name.split()) >= 2 and (best_full is None or len(name) > len(best_full)):
+                        best_full = name
+                elif len(name) > 2 and (best_single is None or len(name) > len(best_single)):
+                    # Single-word names (first names): prefer the longest
+                    best_single = name
             
-            # Select canonical name
-            if full_names:
-                # Prefer longest full name (most complete)
-                main_char['name'] = max(full_names, key=len)
-            elif single_names:
-                # Prefer longest single name
-                main_char['name'] = max(single_names, key=len)
-            elif titles:
-                main_char['name'] = titles[0]
-            else:
-                # Fallback to first alias
-                main_char['name'] = list(aliases)[0]
+            # Select canonical name, falling back to the first callsign/title, then the first alias
+            main_char['name'] = best_full or best_single or next(
+                (name for name in sorted_aliases if self._is_title_pattern(name)),
+                sorted_aliases[0]
+            )
             
             # Add all aliases (sorted)
-            main_char['aliases'] = sorted(list(aliases))
+            main_char['aliases'] = sorted_aliases
             
             merged.append(main_char)
-            used_indices.add(i)
         
         logger.info(f"Filtered {len(characters)} → {len(filtered_characters)} (removed {len(characters) - len(filtered_characters)} non-characters)")
         logger.info(f"Merged {len(filtered_characters)} characters into {len(merged)} unique characters")
         return merged
     
+    def _get_cached_characters(self, sample_text: str) -> Optional[List[Dict]]:
+        """Look up a merged character list in the LLM result cache"""
+        # The prompt doesn't depend on max_characters, so the full merged list
+        # is cached and shared by callers asking for different limits
+        return self._load_cached_result(self._cache_key("characters", sample_text))
+    
+    def _resolve_characters(self, sample_text: str, content: str) -> List[Dict]:
+        """
+        Parse an extraction response, merge name variations and cache the result
+        
+        Args:
+            sample_text: Text the response was generated from
+            content: Raw LLM response
+            
+        Returns:
+            Full merged character list with IDs
+        """
+        try:
+            characters = self._loads_with_repair(content, validate=self._validate_characters)
+        except (fast_json.JSONDecodeError, ValidationError) as e:
+            logger.error(f"Failed to parse LLM response as a character list: {e}")
+            logger.error(f"Response content: {content}")
+            raise Exception("Failed to parse character list from AI response")
+        
+        return self._finalize_characters(sample_text, characters)
+    
+    def _finalize_characters(self, sample_text: str, characters: List[Dict]) -> List[Dict]:
+        """Merge extracted name variations, assign IDs and cache the result"""
+        # Perform entity resolution - merge duplicate characters
+        logger.info(f"Raw extraction found {len(characters)} character mentions")
+        characters = self._merge_characters(characters)
+        
+        # Add character IDs based on normalized names
+        for i, char in enumerate(characters):
+            # Create ID from primary name
+            name_slug = self._slugify(char['name'])
+            char['character_id'] = f"char_{name_slug}" if name_slug else f"char_{i+1:03d}"
+        
+        logger.info(f"Final result: {len(characters)} unique characters after entity resolution")
+        self._save_cached_result(self._cache_key("characters", sample_text), characters)
+        return characters
+    
+    def _resolve_combined(self, sample_text: str, content: str, text: str) -> List[Dict]:
+        """
+        Parse a combined extraction response, caching the characters and
+        each matched personality profile like their separate calls would
+        
+        Returns:
+            Full merged character list with IDs
+        """
+        try:
+            result = self._loads_with_repair(content, validate=CombinedExtraction.model_validate)
+        except (fast_json.JSONDecodeError, ValidationError) as e:
+            logger.error(f"Failed to parse LLM response as characters with profiles: {e}")
+            logger.error(f"Response content: {content}")
+            raise Exception("Failed to parse character list from AI response")
+        
+        characters = self._finalize_characters(
+            sample_text, [char.model_dump() for char in result.characters]
+        )
+        
+        # Profiles may use any name variation, so match them through aliases
+        by_alias = {}
+        for char in characters:
+            for alias in char['aliases']:
+                by_alias.setdefault(self._normalize_name(alias), char['name'])
+        
+        matched = set()
+        for profile in result.profiles:
+            name = by_alias.get(self._normalize_name(profile.pop("name", "")))
+            if name and name not in matched:
+                matched.add(name)
+                self._save_cached_result(self._personality_cache_key(name, text), profile)
+        
+        logger.info(f"Combined extraction returned profiles for {len(matched)}/{len(characters)} characters")
+        return characters
+    
+    @staticmethod
+    def _sample_text(text: str, max_chars: int) -> str:
+        """
+        Leading sample of text with the token cost of max_chars English characters
+        
+        Wide characters (CJK, kana, Hangul) are counted as CHARS_PER_TOKEN
+        characters each, so a Chinese or Korean sample is cut to roughly the
+        same token budget as an English one. Text without wide characters
+        is simply text[:max_chars].
+        
+        Args:
+            text: Story text
+            max_chars: Sample size in English-text characters
+            
+        Returns:
+            Leading portion of text
+        """
+        sample = text[:max_chars]
+        if not WIDE_CHAR_PATTERN.search(sample):
+            return sample
+        
+        cost = 0
+        last = 0
+        for match in WIDE_CHAR_PATTERN.finditer(sample):
+            start, end = match.span()
+            cost += start - last
+            if cost >= max_chars:
+                return sample[:start - (cost - max_chars)]
+            remaining = (max_chars - cost) // CHARS_PER_TOKEN
+            if end - start > remaining:
+                return sample[:start + remaining]
+            cost += (end - start) * CHARS_PER_TOKEN
+            last = end
+        return sample[:last + max_chars - cost]
+    
     def extract_characters(self, text: str, max_characters: int = 10) -> List[Dict]:
         """
         Use LLM to find character names from story text with entity resolution
@@ -319,85 +884,29 @@ class CharacterService:
             List of character dictionaries with aliases merged
         """
         # Use first 15000 characters for better context
-        sample_text = text[:15000]
+        sample_text = self._sample_text(text, self.EXTRACTION_SAMPLE_CHARS)
         
-        prompt = f"""You are an expert at extracting character names from novels.
-
-Extract ALL name variations for each character from the text below. A character may appear as:
-- Full name: "Sung Jinwoo", "Vladilena Milizé"
-- First name only: "Jinwoo", "Lena"
-- Last name only: "Sung"
-- Nicknames: "Lena", "Shin"
-- Callsigns/Titles: "Handler One", "The Undertaker"
-
-TEXT:
-{sample_text}
-
-EXTRACTION RULES:
-
-1. WHAT TO EXTRACT (YES):
-   ✓ Actual character names (proper nouns): "Sung Jinwoo", "Joohee Lee", "Shinei Nouzen"
-   ✓ Nicknames used as names: "Shin", "Lena", "Jinwoo"
-   ✓ Callsigns/titles when used AS A NAME: "Undertaker", "Handler One"
-   ✓ Name variations: "Sung Jinwoo" AND "Jinwoo" AND "Sung" (list separately)
-
-2. WHAT TO IGNORE (NO):
-   ✗ Descriptive phrases: "World's Weakest Hunter", "The Strongest"
-   ✗ Insults/mockery: "idiot", "fool", "weakling"
-   ✗ Generic titles: "the captain", "the queen" (without name)
-   ✗ Group references: "the soldiers", "hunters", "guild members"
-   ✗ Generic terms: "boy", "girl", "stranger", "person"
-
-3. IMPORTANT: List each name variation SEPARATELY
-   - If a character is called "Sung Jinwoo", "Jinwoo", and "Sung" → create 3 entries
-   - If a character has callsign "Undertaker" and name "Shin" → create 2 entries
-   - The merging system will combine them later
-
-4. For each name, provide:
-   - "name": The exact name/nickname/callsign as it appears
-   - "description": WHO this person is (1 sentence, based on text)
-   - "role": "protagonist" / "supporting" / "antagonist" (based on text)
-
-OUTPUT FORMAT (JSON only):
-[
-  {{
-    "name": "Sung Jinwoo",
-    "description": "An E-rank hunter who receives mysterious daily quests",
-    "role": "protagonist"
-  }},
-  {{
-    "name": "Jinwoo",
-    "description": "An E-rank hunter who receives mysterious daily quests",
-    "role": "protagonist"
-  }},
-  {{
-    "name": "Joohee Lee",
-    "description": "A healing spellcaster who worries about Jinwoo",
-    "role": "supporting"
-  }},
-  {{
-    "name": "Joohee",
-    "description": "A healing spellcaster who worries about Jinwoo",
-    "role": "supporting"
-  }}
-]
-
-Return ONLY the JSON array."""
+        cached = self._get_cached_characters(sample_text)
+        if cached is not None:
+            logger.info(f"Returning {min(len(cached), max_characters)} characters from LLM result cache")
+            return cached[:max_characters]
+        
+        prompt = f"""TEXT:
+{sample_text}"""
 
         try:
             # Use Gemini (currently active)
             if settings.AI_PROVIDER == "gemini":
                 if not self.gemini_model:
                     raise Exception("Gemini model not initialized. Check your GEMINI_API_KEY in .env file.")
-                response = self.gemini_model.generate_content(prompt)
-                content = response.text.strip()
+                content = self._generate(prompt, model=self.extraction_model)
             
             # OpenAI implementation - commented for future use
             # elif settings.AI_PROVIDER == "openai":
             #     response = self.openai_client.chat.completions.create(
             #         model=settings.OPENAI_MODEL,
             #         messages=[
-            #             {"role": "system", "content": "You are a literary analyst expert at identifying characters in stories."},
+            #             {"role": "system", "content": EXTRACTION_INSTRUCTIONS},
             #             {"role": "user", "content": prompt}
             #         ],
             #         temperature=0.3,
@@ -408,55 +917,137 @@ Return ONLY the JSON array."""
             else:
                 raise Exception(f"Unsupported AI provider: {settings.AI_PROVIDER}")
             
-            # Remove markdown code blocks if present
-            if content.startswith("```json"):
-                content = content.replace("```json", "").replace("```", "").strip()
-            elif content.startswith("```"):
-                content = content.replace("```", "").strip()
-            
-            characters = json.loads(content)
-            
-            # Perform entity resolution - merge duplicate characters
-            logger.info(f"Raw extraction found {len(characters)} character mentions")
-            characters = self._merge_characters(characters)
+            characters = self._resolve_characters(sample_text, content)
             
             # Limit to max_characters after merging
-            characters = characters[:max_characters]
-            
-            # Add character IDs based on normalized names
-            for i, char in enumerate(characters):
-                # Create ID from primary name
-                name_slug = self._normalize_name(char['name']).replace(' ', '_')
-                name_slug = re.sub(r'[^a-z0-9_]', '', name_slug)
-                char['character_id'] = f"char_{name_slug}" if name_slug else f"char_{i+1:03d}"
-            
-            logger.info(f"Final result: {len(characters)} unique characters after entity resolution")
-            return characters
+            return characters[:max_characters]
+        
+        except Exception as e:
+            logger.error(f"Error extracting characters: {e}")
+            raise
+    
+    async def aextract_characters(self, text: str, max_characters: int = 10) -> List[Dict]:
+        """Async version of extract_characters"""
+        sample_text = self._sample_text(text, self.EXTRACTION_SAMPLE_CHARS)
+        
+        # Cache lookups may embed the text, merging is CPU-bound and a JSON
+        # repair is a blocking call, so those run off the event loop
+        cached = await asyncio.to_thread(self._get_cached_characters, sample_text)
+        if cached is not None:
+            logger.info(f"Returning {min(len(cached), max_characters)} characters from LLM result cache")
+            return cached[:max_characters]
+        
+        prompt = f"""TEXT:
+{sample_text}"""
+
+        try:
+            if settings.AI_PROVIDER == "gemini":
+                if not self.gemini_model:
+                    raise Exception("Gemini model not initialized. Check your GEMINI_API_KEY in .env file.")
+                content = await self._agenerate(prompt, model=self.extraction_model)
+            else:
+                raise Exception(f"Unsupported AI provider: {settings.AI_PROVIDER}")
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse LLM response as JSON: {e}")
-            logger.error(f"Response content: {content}")
-            raise Exception("Failed to parse character list from AI response")
+            characters = await asyncio.to_thread(self._resolve_characters, sample_text, content)
+            return characters[:max_characters]
         
         except Exception as e:
             logger.error(f"Error extracting characters: {e}")
             raise
 
-    def generate_personality_summary(self, character_name: str, text: str) -> Dict:
+    async def aextract_characters_with_personalities(self, text: str, max_characters: int = 10) -> List[Dict]:
         """
-        Generate detailed personality/behavior summary for a specific character
+        Extract characters and their personality summaries, in one LLM call
+        when nothing is cached
+        
+        The combined response caches the character list and each profile
+        under the same keys as aextract_characters and
+        agenerate_personality_summary, so the two paths share results.
+        Characters the combined response has no profile for fall back to
+        agenerate_personality_summaries.
         
         Args:
-            character_name: Name of the character to analyze
-            text: Full story text (or relevant portion)
+            text: Story text (or first portion of it)
+            max_characters: Maximum number of characters to extract
             
         Returns:
-            Dictionary with personality summary
+            List of character dictionaries with aliases merged and a
+            'personality' field (None where generation failed)
         """
+        sample_text = self._sample_text(text, self.EXTRACTION_SAMPLE_CHARS)
+        
+        cached = await asyncio.to_thread(self._get_cached_characters, sample_text)
+        if cached is not None:
+            logger.info(f"Returning {min(len(cached), max_characters)} characters from LLM result cache")
+            characters = cached[:max_characters]
+        else:
+            prompt = f"""TEXT:
+{sample_text}"""
+            
+            try:
+                if settings.AI_PROVIDER == "gemini":
+                    if not self.combined_model:
+                        raise Exception("Gemini model not initialized. Check your GEMINI_API_KEY in .env file.")
+                    content = await self._agenerate(prompt, model=self.combined_model)
+                else:
+                    raise Exception(f"Unsupported AI provider: {settings.AI_PROVIDER}")
+                
+                characters = await asyncio.to_thread(self._resolve_combined, sample_text, content, text)
+                characters = characters[:max_characters]
+            
+            except Exception as e:
+                logger.error(f"Error extracting characters: {e}")
+                raise
+        
+        # Profiles from the combined call are cached, so only missing ones cost a call
+        personalities = await self.agenerate_personality_summaries(
+            character_names=[character['name'] for character in characters],
+            text=text
+        )
+        for character, personality in zip(characters, personalities):
+            character['personality'] = personality
+        return characters
+    
+    async def aextract_characters_batch(
+        self,
+        texts: List[str],
+        max_characters: int = 10,
+        max_concurrency: int = 8
+    ) -> List[Optional[List[Dict]]]:
+        """
+        Extract characters from several books concurrently
+        
+        While one book waits on its LLM response, others are sent or merged
+        (merging runs in a worker thread), so a batch takes roughly as long
+        as its slowest books rather than the sum of all of them.
+        
+        Args:
+            texts: Story texts, one per book
+            max_characters: Maximum number of characters per book
+            max_concurrency: Maximum number of books in flight
+            
+        Returns:
+            Character lists in the same order as texts, with None for books
+            whose extraction failed
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def extract(text: str) -> Optional[List[Dict]]:
+            async with semaphore:
+                try:
+                    return await self.aextract_characters(text, max_characters=max_characters)
+                except Exception as e:
+                    logger.warning(f"Failed to extract characters for batch item: {e}")
+                    return None
+        
+        return await asyncio.gather(*(extract(text) for text in texts))
+    
+    def _build_personality_prompt(self, character_name: str, text: str) -> str:
+        """Build the personality analysis prompt for a character"""
         # Use first 10000 characters for personality analysis
-        sample_text = text[:10000]
+        sample_text = self._sample_text(text, self.PERSONALITY_SAMPLE_CHARS)
         
-        prompt = f"""You are a literary psychologist. Analyze the character "{character_name}" from the following story excerpt.
+        return f"""You are a literary psychologist. Analyze the character "{character_name}" from the following story excerpt.
 
 Story excerpt:
 {sample_text}
@@ -479,13 +1070,54 @@ Return your response as a JSON object with this format:
 
 Return ONLY the JSON object, no additional text."""
 
+    def _personality_cache_key(self, character_name: str, text: str) -> str:
+        """Cache key for a character's personality summary"""
+        return self._cache_key("personality", character_name, self._sample_text(text, self.PERSONALITY_SAMPLE_CHARS))
+
+    def _parse_personality_response(self, character_name: str, content: str, cache_key: str) -> Dict:
+        """Parse and cache a personality summary response, falling back to a basic structure"""
+        try:
+            personality_data = fast_json.loads(content)
+            logger.info(f"Generated personality summary for {character_name}")
+            self._save_cached_result(cache_key, personality_data)
+            return personality_data
+            
+        except fast_json.JSONDecodeError as e:
+            logger.error(f"Failed to parse personality summary as JSON: {e}")
+            logger.error(f"Response content: {content}")
+            # Return basic structure if parsing fails
+            return {
+                "personality_traits": ["Unknown"],
+                "behavior_summary": "Unable to generate personality summary",
+                "motivations": "Unknown",
+                "character_arc": "Unknown",
+                "defining_moments": []
+            }
+
+    def generate_personality_summary(self, character_name: str, text: str) -> Dict:
+        """
+        Generate detailed personality/behavior summary for a specific character
+        
+        Args:
+            character_name: Name of the character to analyze
+            text: Full story text (or relevant portion)
+            
+        Returns:
+            Dictionary with personality summary
+        """
+        cache_key = self._personality_cache_key(character_name, text)
+        cached = self._load_cached_result(cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_personality_prompt(character_name, text)
+
         try:
             # Use Gemini (currently active)
             if settings.AI_PROVIDER == "gemini":
                 if not self.gemini_model:
                     raise Exception("Gemini model not initialized. Check your GEMINI_API_KEY in .env file.")
-                response = self.gemini_model.generate_content(prompt)
-                content = response.text.strip()
+                content = self._generate(prompt, schema=PERSONALITY_SCHEMA)
             
             # OpenAI implementation - commented for future use
             # elif settings.AI_PROVIDER == "openai":
@@ -503,36 +1135,217 @@ Return ONLY the JSON object, no additional text."""
             else:
                 raise Exception(f"Unsupported AI provider: {settings.AI_PROVIDER}")
             
-            # Remove markdown code blocks if present
-            if content.startswith("```json"):
-                content = content.replace("```json", "").replace("```", "").strip()
-            elif content.startswith("```"):
-                content = content.replace("```", "").strip()
-            
-            personality_data = json.loads(content)
-            logger.info(f"Generated personality summary for {character_name}")
-            return personality_data
+            return self._parse_personality_response(character_name, content, cache_key)
+        
+        except Exception as e:
+            logger.error(f"Error generating personality summary: {e}")
+            raise
+    
+    async def agenerate_personality_summary(self, character_name: str, text: str) -> Dict:
+        """Async version of generate_personality_summary"""
+        cache_key = self._personality_cache_key(character_name, text)
+        # Cache reads and fsync'd writes run off the event loop
+        cached = await asyncio.to_thread(self._load_cached_result, cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_personality_prompt(character_name, text)
+
+        try:
+            if settings.AI_PROVIDER == "gemini":
+                if not self.gemini_model:
+                    raise Exception("Gemini model not initialized. Check your GEMINI_API_KEY in .env file.")
+                content = await self._agenerate(prompt, schema=PERSONALITY_SCHEMA)
+            else:
+                raise Exception(f"Unsupported AI provider: {settings.AI_PROVIDER}")
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse personality summary as JSON: {e}")
-            logger.error(f"Response content: {content}")
-            # Return basic structure if parsing fails
-            return {
-                "personality_traits": ["Unknown"],
-                "behavior_summary": "Unable to generate personality summary",
-                "motivations": "Unknown",
-                "character_arc": "Unknown",
-                "defining_moments": []
-            }
+            return await asyncio.to_thread(self._parse_personality_response, character_name, content, cache_key)
         
         except Exception as e:
             logger.error(f"Error generating personality summary: {e}")
             raise
     
+    def _build_group_personality_prompt(self, character_names: List[str], text: str) -> str:
+        """Build one personality analysis prompt covering several characters"""
+        # Use first 10000 characters for personality analysis
+        sample_text = self._sample_text(text, self.PERSONALITY_SAMPLE_CHARS)
+        names_list = "\n".join(f"- {name}" for name in character_names)
+        
+        return f"""You are a literary psychologist. Analyze each of the following characters from the story excerpt below.
+
+Characters:
+{names_list}
+
+Story excerpt:
+{sample_text}
+
+For EACH character provide a detailed personality and behavior analysis. Include:
+1. Key personality traits (e.g., brave, curious, kind, stubborn)
+2. Behavioral patterns and how they interact with others
+3. Motivations and goals
+4. Character arc or development (if visible in this excerpt)
+5. Notable quotes or actions that define them
+
+Return your response as a JSON object with this format, one entry per character, using the character names exactly as listed:
+{{
+  "profiles": [
+    {{
+      "name": "Character name",
+      "personality_traits": ["trait1", "trait2", "trait3"],
+      "behavior_summary": "2-3 sentence summary of how they behave and interact",
+      "motivations": "What drives this character",
+      "character_arc": "How they change or develop in the story",
+      "defining_moments": ["quote or action 1", "quote or action 2"]
+    }}
+  ]
+}}
+
+Return ONLY the JSON object, no additional text."""
+
+    async def _agenerate_personality_group(self, character_names: List[str], text: str) -> Dict[str, Dict]:
+        """
+        Generate personality summaries for several characters in one LLM call
+        
+        Returns:
+            Personality summaries keyed by character name; characters missing
+            from the response are left out
+        """
+        if not self.gemini_model:
+            raise Exception("Gemini model not initialized. Check your GEMINI_API_KEY in .env file.")
+        
+        prompt = self._build_group_personality_prompt(character_names, text)
+        content = await self._agenerate(prompt, schema=PERSONALITY_GROUP_SCHEMA)
+        
+        # Parsing and the fsync'd cache writes run off the event loop
+        summaries = await asyncio.to_thread(self._resolve_personality_group, character_names, text, content)
+        logger.info(f"Generated {len(summaries)}/{len(character_names)} personality summaries in one call")
+        return summaries
+    
+    def _resolve_personality_group(self, character_names: List[str], text: str, content: str) -> Dict[str, Dict]:
+        """Match a grouped personality response back to the requested names and cache each profile"""
+        profiles = fast_json.loads(content).get("profiles", [])
+        
+        # Match profiles back to the requested names
+        by_name = {self._normalize_name(name): name for name in character_names}
+        summaries = {}
+        for profile in profiles:
+            name = by_name.get(self._normalize_name(profile.pop("name", "")))
+            if name:
+                summaries[name] = profile
+                self._save_cached_result(self._personality_cache_key(name, text), profile)
+        return summaries
+    
+    def _load_cached_personalities(self, character_names: List[str], text: str) -> Dict[str, Dict]:
+        """Cached personality summaries for the given characters, keyed by name"""
+        summaries = {}
+        for name in character_names:
+            cached = self._load_cached_result(self._personality_cache_key(name, text))
+            if cached is not None:
+                summaries[name] = cached
+        return summaries
+
+    async def agenerate_personality_summaries(
+        self,
+        character_names: List[str],
+        text: str,
+        max_concurrency: int = 8,
+        group_size: int = 4
+    ) -> List[Optional[Dict]]:
+        """
+        Generate personality summaries for several characters concurrently
+        
+        Characters are analyzed group_size at a time in a single LLM call so
+        the shared story excerpt is only sent once per group. Characters a
+        group response misses fall back to their own call.
+        
+        Args:
+            character_names: Names of the characters to analyze
+            text: Full story text (or relevant portion)
+            max_concurrency: Maximum number of requests in flight
+            group_size: Number of characters analyzed per LLM call
+            
+        Returns:
+            Personality summaries in the same order as character_names,
+            with None for characters whose summary failed
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def summarize(name: str) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await self.agenerate_personality_summary(name, text)
+                except Exception as e:
+                    # If personality generation fails, continue without it
+                    logger.warning(f"Failed to generate personality for {name}: {e}")
+                    return None
+        
+        async def summarize_group(names: List[str]) -> List[Optional[Dict]]:
+            summaries = await asyncio.to_thread(self._load_cached_personalities, names, text)
+            
+            uncached = [name for name in names if name not in summaries]
+            if len(uncached) > 1 and settings.AI_PROVIDER == "gemini":
+                async with semaphore:
+                    try:
+                        summaries.update(await self._agenerate_personality_group(uncached, text))
+                    except Exception as e:
+                        logger.warning(f"Grouped personality generation failed, falling back per character: {e}")
+            
+            missing = [name for name in names if name not in summaries]
+            for name, summary in zip(missing, await asyncio.gather(*(summarize(name) for name in missing))):
+                summaries[name] = summary
+            return [summaries[name] for name in names]
+        
+        groups = [character_names[i:i + group_size] for i in range(0, len(character_names), group_size)]
+        results = await asyncio.gather(*(summarize_group(group) for group in groups))
+        return [summary for group in results for summary in group]
+    
+    def _get_ner_pipeline(self):
+        """Load the spaCy NER pipeline on first use (None if unavailable)"""
+        if CharacterService._nlp is None:
+            try:
+                import spacy
+                CharacterService._nlp = spacy.load(
+                    settings.SPACY_MODEL,
+                    disable=["parser", "tagger", "lemmatizer", "attribute_ruler"]
+                )
+                logger.info(f"Loaded spaCy model {settings.SPACY_MODEL} for character counting")
+            except Exception as e:
+                logger.warning(f"spaCy NER unavailable, character count will use the LLM: {e}")
+                CharacterService._nlp = False
+        return CharacterService._nlp or None
+    
     def get_character_count(self, text: str) -> int:
-        """Quick count of potential characters in text"""
+        """
+        Quick count of potential characters in text
+        
+        Counts distinct PERSON entities found by local spaCy NER in the
+        opening of the text, falling back to a full LLM extraction when
+        spaCy or its model isn't installed.
+        """
+        nlp = self._get_ner_pipeline()
+        if nlp is not None:
+            doc = nlp(text[:self.NER_SAMPLE_CHARS])
+            names = {
+                self._normalize_name(ent.text)
+                for ent in doc.ents
+                if ent.label_ == "PERSON"
+            }
+            return len({name for name in names if name and not self._is_non_character(name)})
+        
         try:
             characters = self.extract_characters(text)
             return len(characters)
         except:
-            return 0
\ No newline at end of file
+            return 0
+
+_instance: Optional[CharacterService] = None
+_instance_lock = threading.Lock()
+
+def get_character_service() -> CharacterService:
+    """Get the process-wide CharacterService, creating it on first use"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = CharacterService()
+    return _instance
@@ -6,9 +6,11 @@ from typing import List, Dict, Optional
 import google.generativeai as genai
 import json
 import logging
+import re
 
 from src.config import settings
-from src.rag.rag_service import RAGService
+from src.services.gemini_client import configure_gemini, request_options
+from src.rag.registry import rag
 
 logger = logging.getLogger(__name__)
 
@@ -33,14 +35,36 @@ class ChatService:
                 logger.error("GEMINI_API_KEY not found")
             else:
                 try:
-                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    configure_gemini()
                     self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
                     logger.info("Chat service initialized with Gemini")
                 except Exception as e:
                     logger.error(f"Failed to initialize Gemini: {e}")
         
         # Initialize RAG service
-        self.rag_service = RAGService()
+        self.rag_service = rag()
+    
+    def _prioritize_character_context(self, character: Dict, relevant_context: List[Dict]) -> List[Dict]:
+        """
+        Order retrieved chunks so those naming the character come first
+        
+        Only the top few chunks make it into the prompt, so this keeps
+        embedding-similar passages that never mention the character from
+        crowding out ones that do. Relative order is otherwise preserved.
+        """
+        names = {character.get('name', '')} | set(character.get('aliases') or [])
+        names = sorted((name for name in names if name), key=len, reverse=True)
+        if not names or not relevant_context:
+            return relevant_context
+        
+        pattern = re.compile(
+            r'\b(?:' + '|'.join(re.escape(name) for name in names) + r')\b',
+            re.IGNORECASE
+        )
+        mentioning, others = [], []
+        for ctx in relevant_context:
+            (mentioning if pattern.search(ctx['text']) else others).append(ctx)
+        return mentioning + others
     
     def _build_character_prompt(
         self,
@@ -86,8 +110,8 @@ class ChatService:
         if relevant_context:
             context_section = "\n\n=== STORY CONTEXT (Your source of truth) ===\n"
             for i, ctx in enumerate(relevant_context[:3], 1):
-                # Truncate very long contexts
-                context_text = ctx['text'][:500] if len(ctx['text']) > 500 else ctx['text']
+                # Truncate very long contexts (slicing is a no-op for short ones)
+                context_text = ctx['text'][:500]
                 context_section += f"\n[Context {i}]:\n{context_text}\n"
             context_section += "\n=== END STORY CONTEXT ===\n"
         
@@ -149,6 +173,7 @@ Respond as {name}:"""
                 document_id=document_id,
                 n_results=5
             )
+            relevant_context = self._prioritize_character_context(character, relevant_context)
             
             # Build prompt
             prompt = self._build_character_prompt(
@@ -163,7 +188,9 @@ Respond as {name}:"""
                 if not self.gemini_model:
                     raise Exception("Gemini model not initialized")
                 
-                response = self.gemini_model.generate_content(prompt)
+                response = self.gemini_model.generate_content(
+                    prompt, request_options=request_options()
+                )
                 character_response = response.text.strip()
             else:
                 raise Exception(f"Unsupported AI provider: {settings.AI_PROVIDER}")
@@ -240,7 +267,8 @@ RULES:
                     generation_config=genai.types.GenerationConfig(
                         temperature=0.7,  # Some creativity but controlled
                         max_output_tokens=100  # Keep greetings short
-                    )
+                    ),
+                    request_options=request_options()
                 )
                 greeting = response.text.strip()
                 
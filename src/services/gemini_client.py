@@ -0,0 +1,36 @@
+"""
+Gemini Client Setup
+Configures google-generativeai once per process
+"""
+import google.generativeai as genai
+import threading
+
+from src.config import settings
+
+_configured = False
+_lock = threading.Lock()
+
+def configure_gemini() -> None:
+    """
+    Configure the Gemini SDK with the API key, once per process
+
+    genai.configure() drops the SDK's cached API clients, so calling it for
+    every service instance would throw away open gRPC channels.
+    """
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if not _configured:
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            _configured = True
+
+def request_options() -> dict:
+    """
+    Per-call options for generate_content
+
+    Without a deadline a stalled call holds its worker (or the chat
+    request) indefinitely; with one it fails with DeadlineExceeded, which
+    CharacterService retries as a transient error.
+    """
+    return {"timeout": settings.GEMINI_REQUEST_TIMEOUT}
@@ -0,0 +1,86 @@
+"""
+LLM Result Cache
+Content-addressed disk cache for parsed LLM results
+"""
+from pathlib import Path
+from typing import Any, Optional
+import hashlib
+import logging
+import time
+
+from src.utils import fast_json
+from src.utils.atomic_write import atomic_write_bytes
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """Stores LLM results as JSON files named by a hash of their inputs"""
+    
+    def __init__(self, cache_dir: str = "data/cache/llm", ttl_seconds: Optional[int] = 7 * 24 * 3600):
+        """
+        Initialize LLM result cache
+        
+        Args:
+            cache_dir: Directory to store cache files
+            ttl_seconds: Age after which entries are ignored (None to keep forever)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+    
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """
+        Build a cache key from the inputs that determine a result
+        
+        Each part is length-prefixed before hashing, so different splits of
+        the same characters (e.g. "ab" + "c" vs "a" + "bc") never collide.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode('utf-8')
+            digest.update(len(data).to_bytes(8, 'big'))
+            digest.update(data)
+        return digest.hexdigest()
+    
+    def _get_cache_path(self, key: str) -> Path:
+        """Get cache file path for a key"""
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a cached result
+        
+        Args:
+            key: Cache key from make_key()
+            
+        Returns:
+            Cached value or None on a miss or expired entry
+        """
+        cache_path = self._get_cache_path(key)
+        try:
+            entry = fast_json.loads(cache_path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {cache_path}: {e}")
+            return None
+        
+        if self.ttl_seconds is not None and time.time() - entry.get('created_at', 0) > self.ttl_seconds:
+            return None
+        return entry.get('value')
+    
+    def set(self, key: str, value: Any, **metadata: str) -> None:
+        """
+        Store a result (failures are logged, never raised)
+        
+        Args:
+            key: Cache key from make_key()
+            value: JSON-serializable result
+            metadata: Extra fields recorded alongside the value (e.g. model)
+        """
+        entry = {"value": value, "created_at": time.time(), **metadata}
+        try:
+            atomic_write_bytes(self._get_cache_path(key), fast_json.dumps(entry))
+        except Exception as e:
+            logger.warning(f"Failed to cache LLM result: {e}")
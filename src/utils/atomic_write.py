@@ -0,0 +1,28 @@
+"""
+Atomic file writes
+Readers see either the old file or the complete new one, never a partial write
+"""
+from pathlib import Path
+import os
+import uuid
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    Write data to path via a synced temp file and os.replace
+
+    Args:
+        path: Destination file
+        data: File contents
+    """
+    path = Path(path)
+    # Unique temp name so concurrent writers of the same file don't collide
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,90 @@
+"""
+Chunk File Reader
+Rebuilds document text from the chunks file written on upload
+"""
+from pathlib import Path
+from typing import Iterator, Optional
+import io
+import re
+
+CHUNK_HEADER_PATTERN = re.compile(r'=== CHUNK \d+ ===\n')
+
+# Consecutive chunks repeat exactly this many characters (upload chunk overlap)
+CHUNK_OVERLAP_CHARS = 100
+
+def iter_chunk_texts(chunks_path: Path) -> Iterator[str]:
+    """
+    Yield the text of each chunk in a chunks file, in order
+
+    Args:
+        chunks_path: Path to the {document_id}_chunks.txt file
+
+    Yields:
+        Chunk texts without headers or separators
+    """
+    buffer = io.StringIO()
+
+    with open(chunks_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            # Headers end with a newline, so they never span lines
+            if CHUNK_HEADER_PATTERN.fullmatch(line):
+                chunk = buffer.getvalue().rstrip('\n')
+                if chunk:
+                    yield chunk
+                buffer = io.StringIO()
+                continue
+            buffer.write(line)
+
+    chunk = buffer.getvalue().rstrip('\n')
+    if chunk:
+        yield chunk
+
+def _strip_overlap(previous: str, chunk: str) -> str:
+    """
+    Remove the start of chunk that repeats the end of the previous chunk
+
+    The chunker repeats exactly CHUNK_OVERLAP_CHARS characters; only the
+    whitespace stripped from chunk edges makes the stored overlap shorter.
+    So the longest prefix of chunk within that bound that previous ends
+    with is the overlap, however short it is. A last chunk that lies wholly
+    inside the previous chunk's tail is therefore dropped entirely.
+    """
+    longest = min(len(previous), len(chunk), CHUNK_OVERLAP_CHARS)
+    for size in range(longest, 0, -1):
+        if previous.endswith(chunk[:size]):
+            return chunk[size:].lstrip()
+    return chunk
+
+def read_document_text(chunks_path: Path, max_chars: Optional[int] = None) -> str:
+    """
+    Read document text from a chunks file, removing chunk headers and the
+    text each chunk repeats from the previous one
+
+    Stops reading once max_chars characters have been collected, so callers
+    that only need a sample never load the whole book.
+
+    Args:
+        chunks_path: Path to the {document_id}_chunks.txt file
+        max_chars: Maximum number of characters to return (None for all)
+
+    Returns:
+        Document text (at most max_chars characters)
+    """
+    buffer = io.StringIO()
+    length = 0
+    previous = ""
+
+    for chunk in iter_chunk_texts(chunks_path):
+        text = _strip_overlap(previous, chunk) if previous else chunk
+        previous = chunk
+        if not text:
+            continue
+        if length:
+            text = "\n" + text
+        if max_chars is not None and length + len(text) >= max_chars:
+            buffer.write(text[:max_chars - length])
+            break
+        buffer.write(text)
+        length += len(text)
+
+    return buffer.getvalue()
@@ -1,12 +1,15 @@
 import pdfplumber
 import PyPDF2
 import re
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PAGE_NUMBER_LINE_PATTERN = re.compile(r'\n\d+\n')
+
 class TextExtractor:
     """Extract and preprocess text from PDF files"""
 
@@ -41,6 +44,42 @@ class TextExtractor:
         Returns:
             Dictionary with extracted text and metadata
         """
+        info = {}
+        text_by_page = list(self.iter_pages(pdf_path, info))
+        
+        full_text = "\n\n".join([p["text"] for p in text_by_page])
+        
+        if not full_text or len(full_text.strip()) < 100:
+            raise Exception("PDF appears to be empty or contains no extractable text")
+        
+        logger.info(f"Successfully extracted {info['page_count']} pages using {info['method']}")
+        return {
+            "full_text": full_text,
+            "pages": text_by_page,
+            "page_count": info["page_count"],
+            "total_length": len(full_text),
+            "method": info["method"]
+        }
+
+    def iter_pages(self, pdf_path: str, info: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Stream cleaned pages from a PDF using pdfplumber (primary)
+        with PyPDF2 fallback
+
+        Pages are yielded as soon as they are parsed, so consumers can start
+        processing while parsing continues. If pdfplumber fails part way
+        through, PyPDF2 picks up after the last page already yielded.
+
+        Args:
+            pdf_path: Path to PDF file
+            info: Optional dict filled with "page_count" and "method"
+
+        Yields:
+            Dictionaries with "page" number and cleaned "text"
+        """
+        if info is None:
+            info = {}
+        
         # Validate PDF first
         try:
             self._validate_pdf(pdf_path)
@@ -50,113 +89,88 @@ class TextExtractor:
         
         # Try pdfplumber first
         pdfplumber_error = None
+        last_page = 0  # Number of the last page already yielded
         try:
-            result = self._extract_with_pdfplumber(pdf_path)
-            logger.info(f"Successfully extracted {result['page_count']} pages using pdfplumber")
-            return result
+            for page in self._iter_with_pdfplumber(pdf_path, info):
+                last_page = page["page"]
+                yield page
+            if last_page:
+                return
+            raise Exception("PDF appears to be empty or contains no extractable text")
         except Exception as e:
             pdfplumber_error = str(e)
             logger.warning(f"pdfplumber extraction failed: {pdfplumber_error}")
         
-        # Fallback to PyPDF2
-        logger.info("Attempting PyPDF2 fallback extraction...")
+        # Fallback to PyPDF2, skipping pages pdfplumber already produced
+        if last_page:
+            logger.info(f"Attempting PyPDF2 fallback extraction from page {last_page + 1}...")
+        else:
+            logger.info("Attempting PyPDF2 fallback extraction...")
         try:
-            result = self._extract_with_pypdf2(pdf_path)
-            logger.info(f"Successfully extracted {result['page_count']} pages using PyPDF2")
-            return result
+            yield from self._iter_with_pypdf2(pdf_path, info, start_page=last_page + 1)
+            if last_page:
+                info["method"] = "pdfplumber+PyPDF2"
         except Exception as e2:
             pypdf2_error = str(e2)
             logger.error(f"PyPDF2 extraction also failed: {pypdf2_error}")
             raise Exception(f"PDF extraction failed with both methods. pdfplumber error: {pdfplumber_error}. PyPDF2 error: {pypdf2_error}")
 
-    def _extract_with_pdfplumber(self, pdf_path: str) -> Dict:
+    def _iter_with_pdfplumber(self, pdf_path: str, info: Dict) -> Iterator[Dict]:
         """Extract using pdfplumber (better layout preservation)"""
-        text_by_page = []
-        total_pages = 0
-        
         try:
-            pdf = pdfplumber.open(pdf_path)
-            total_pages = len(pdf.pages)
-            
-            for page_num, page in enumerate(pdf.pages, 1):
-                try:
-                    text = page.extract_text()
+            with pdfplumber.open(pdf_path) as pdf:
+                info["page_count"] = len(pdf.pages)
+                info["method"] = "pdfplumber"
+                
+                for page_num, page in enumerate(pdf.pages, 1):
+                    try:
+                        text = page.extract_text()
+                    except Exception as page_error:
+                        logger.warning(f"Failed to extract page {page_num}: {page_error}")
+                        # Continue to next page even if one page fails
+                        continue
                     if text and len(text.strip()) > self.min_text_length:
-                        cleaned_text = self._clean_text(text)
-                        text_by_page.append({
+                        yield {
                             "page": page_num,
-                            "text": cleaned_text
-                        })
-                except Exception as page_error:
-                    logger.warning(f"Failed to extract page {page_num}: {page_error}")
-                    # Continue to next page even if one page fails
-                    continue
-            
-            pdf.close()
-            
-            full_text = "\n\n".join([p["text"] for p in text_by_page])
-            
-            if not full_text or len(full_text.strip()) < 100:
-                raise Exception("PDF appears to be empty or contains no extractable text")
-
-            return {
-                "full_text": full_text,
-                "pages": text_by_page,
-                "page_count": total_pages,
-                "total_length": len(full_text),
-                "method": "pdfplumber"
-            }
+                            "text": self._clean_text(text)
+                        }
         except Exception as e:
             error_msg = str(e)
             if "Compressed file" in error_msg or "end-of-stream" in error_msg:
                 raise Exception(f"PDF compression error: {error_msg}. This PDF may use unsupported compression or be corrupted.")
             raise Exception(f"pdfplumber extraction failed: {error_msg}")
 
-    def _extract_with_pypdf2(self, pdf_path: str) -> Dict:
-        """Fallback extraction using PyPDF2"""
-        text_by_page = []
-
+    def _iter_with_pypdf2(self, pdf_path: str, info: Dict, start_page: int = 1) -> Iterator[Dict]:
+        """Fallback extraction using PyPDF2, starting at start_page (1-based)"""
         try:
             with open(pdf_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
                 total_pages = len(reader.pages)
+                info["page_count"] = total_pages
+                info["method"] = "PyPDF2"
 
-                for page_num in range(total_pages):
+                for page_num in range(start_page - 1, total_pages):
                     try:
                         page = reader.pages[page_num]
                         text = page.extract_text()
-                        if text and len(text.strip()) > self.min_text_length:
-                            cleaned_text = self._clean_text(text)
-                            text_by_page.append({
-                                "page": page_num + 1,
-                                "text": cleaned_text
-                            })
                     except Exception as page_error:
                         logger.warning(f"Failed to extract page {page_num + 1}: {page_error}")
                         continue
-
-            full_text = "\n\n".join([p["text"] for p in text_by_page])
-            
-            if not full_text or len(full_text.strip()) < 100:
-                raise Exception("PDF appears to be empty or contains no extractable text")
-
-            return {
-                "full_text": full_text,
-                "pages": text_by_page,
-                "page_count": total_pages,
-                "total_length": len(full_text),
-                "method": "PyPDF2"
-            }
+                    if text and len(text.strip()) > self.min_text_length:
+                        yield {
+                            "page": page_num + 1,
+                            "text": self._clean_text(text)
+                        }
         except Exception as e:
             raise Exception(f"PDF extraction failed: {str(e)}. The file may be corrupted, password-protected, or in an unsupported format.")
 
     def _clean_text(self, text: str) -> str:
         """Clean and normalize extracted text"""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = WHITESPACE_PATTERN.sub(' ', text)
 
         # Remove page numbers and headers/footers (basic)
-        text = re.sub(r'\n\d+\n', '\n', text)
+        text = PAGE_NUMBER_LINE_PATTERN.sub('\n', text)
 
         # Fix common OCR errors
         text = text.replace("'", "'")
@@ -182,28 +196,65 @@ class TextExtractor:
         if not text:
             return []
         
-        chunks = []
+        return list(self.iter_chunks([text], chunk_size=chunk_size, overlap=overlap))
+
+    def iter_chunks(self, text_stream: Iterable[str], chunk_size: int = 1000, overlap: int = 100) -> Iterator[str]:
+        """
+        Incrementally split a stream of text pieces into overlapping chunks
+
+        The pieces are treated as one concatenated text, so the output matches
+        chunk_text() on the joined string while only buffering about one chunk.
+
+        Args:
+            text_stream: Iterable of consecutive text pieces
+            chunk_size: Target chunk size in characters
+            overlap: Overlap between chunks
+
+        Yields:
+            Text chunks
+        """
+        pieces = iter(text_stream)
+        buffer = ""
+        offset = 0  # Absolute position of buffer[0] in the full text
+        exhausted = False
+        chunk_count = 0
         start = 0
         
-        while start < len(text):
+        while True:
             end = start + chunk_size
-            chunk = text[start:end]
+            
+            # Buffer until we know whether this chunk ends before the text does
+            while not exhausted and offset + len(buffer) <= end:
+                try:
+                    buffer += next(pieces)
+                except StopIteration:
+                    exhausted = True
+            
+            text_length = offset + len(buffer)
+            if start >= text_length:
+                break
+            
+            chunk = buffer[start - offset:end - offset]
             
             # Try to break at sentence boundaries
-            if end < len(text):
+            if end < text_length:
                 last_period = chunk.rfind('.')
                 last_newline = chunk.rfind('\n')
                 break_point = max(last_period, last_newline)
                 
                 if break_point > chunk_size // 2:
                     end = start + break_point + 1
-                    chunk = text[start:end]
+                    chunk = buffer[start - offset:end - offset]
             
-            chunks.append(chunk.strip())
+            yield chunk.strip()
+            chunk_count += 1
             start = end - overlap
             
             # Prevent infinite loop - ensure we're moving forward
-            if start >= end or (len(chunks) > 1 and start <= 0):
+            if start >= end or (chunk_count > 1 and start <= 0):
                 break
-        
-        return chunks
\ No newline at end of file
+            
+            # Drop text that no later chunk can reach
+            if start > offset:
+                buffer = buffer[start - offset:]
+                offset = start